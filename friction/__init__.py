@@ -0,0 +1,3 @@
+"""
+Shared code for the friction modeling pages
+"""
@@ -0,0 +1,128 @@
+"""
+Benchmarks of the page hot paths on synthetic data
+
+Times snapshot round trips, row selection (dataSelect, dataFilter), the
+per-county threshold counts (dataThreshold), the time-to-threshold solver,
+the model functions and the figure builders on synthetic fric/est_per_proj
+tables of growing size. Each
+stage reports the best of `repeat` runs. Results are appended as JSON lines
+(one line per stage and size, tagged with the run time and git commit) so
+runs of different commits can be compared.
+
+    python -m friction.bench --sizes 10000 100000 1000000 10000000 --out benchmarks.jsonl
+"""
+import argparse
+import datetime
+import json
+import os
+import subprocess
+import tempfile
+import time
+
+import numpy as np
+
+from friction import data as snapshots
+from friction.coefficients import coefficientSet
+from friction.index import buildIndex, selectRows
+from friction.models import m1, m1_v1, m2, m2_v1, mdistrict, predictBatch
+from friction.pivot import thresholdCounts, thresholdIndex
+from friction.plots import boxFigure, histogramFigure, scatterFigure
+from friction.synth import synthCounties, synthFric, synthProjects
+from friction.threshold import countyRollup, thresholdAges
+
+
+SIZES = [10000, 100000, 1000000, 10000000]
+
+FILTERS = ("DISTR", "CONT", "HIGHWAY_FUN", "PAV_TYPE")
+
+
+def bestTime(fn, repeat):
+    """Shortest wall time of repeat calls of fn"""
+    best = np.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter()-start)
+    return best
+
+
+def stages(fric, projects, counties, x):
+    """(name, function) of every benchmarked stage on these tables"""
+    index = buildIndex(fric, FILTERS)
+    selection = {"DISTR": [12, 14, 18], "CONT": None, "HIGHWAY_FUN": ["FM", "SH"], "PAV_TYPE": None}
+    filtered = projects.loc[projects["a_m1"].notna() & (projects["PAV_TYPE"] != "other")].reset_index(drop = True)
+    threshold = thresholdIndex(filtered, "a_m1", counties["County_FIPS_Code"])
+    age = fric["AGE"].to_numpy(dtype = np.float64)
+    pred = m2(x["stepwise"]["m2"], fric)
+
+    def roundTrip():
+        snapshots.writeSnapshot("bench", fric)
+        snapshots.readSnapshot("bench")
+
+    return [("snapshot", roundTrip),
+            ("buildIndex", lambda: buildIndex(fric, FILTERS)),
+            ("dataSelect", lambda: fric.take(selectRows(index, selection))),
+            ("dataFilter", lambda: projects.loc[projects["a_m1"].notna() & (projects["PAV_TYPE"] != "other")].reset_index(drop = True)),
+            ("thresholdIndex", lambda: thresholdIndex(filtered, "a_m1", counties["County_FIPS_Code"])),
+            ("thresholdCounts", lambda: thresholdCounts(threshold, 30.0)),
+            ("m1", lambda: m1(x["stepwise"]["m1"], fric)),
+            ("m2", lambda: m2(x["stepwise"]["m2"], fric)),
+            ("m1_v1", lambda: m1_v1(x["remove_facility"]["m1"], fric)),
+            ("m2_v1", lambda: m2_v1(x["remove_facility"]["m2"], fric)),
+            ("mdistrict", lambda: mdistrict(x["remove_facility"]["m1"], x["District-a"]["m1"], fric, "m1", "a")),
+            ("predictBatch", lambda: predictBatch(x, fric)),
+            ("thresholdAges", lambda: thresholdAges(x, "District-a", "m1", filtered, 30.0)),
+            ("countyRollup", lambda: countyRollup(thresholdAges(x, "stepwise", "m1", filtered, 30.0), filtered, counties)),
+            ("boxFigure", lambda: boxFigure(age, {"observed": fric["SN_cummin"], "pred": pred}).to_json()),
+            ("histogramFigure", lambda: histogramFigure(filtered["a_m1"], start = 0.0, log_y = True).to_json()),
+            ("scatterFigure", lambda: scatterFigure(filtered["AADT"], filtered["a_m1"]).to_json())]
+
+
+def commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output = True, text = True, check = True,
+                              cwd = os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(sizes = SIZES, repeat = 3, only = None, seed = 0):
+    """Result dict per (stage, size)"""
+    x = coefficientSet()
+    counties = synthCounties()
+    results = []
+    snapshotDir = snapshots.SNAPSHOT_DIR
+    with tempfile.TemporaryDirectory() as tmp:
+        snapshots.SNAPSHOT_DIR = tmp  # keep benchmark snapshots out of the real cache
+        try:
+            for n in sizes:
+                fric = synthFric(n, seed = seed, x = x)
+                projects = synthProjects(n, seed = seed, counties = counties)
+                for name, fn in stages(fric, projects, counties, x):
+                    if only and name not in only:
+                        continue
+                    seconds = bestTime(fn, repeat)
+                    results.append({"stage": name, "rows": n, "seconds": seconds})
+                    print("%-16s %10d rows %10.4f s" % (name, n, seconds), flush = True)
+                del fric, projects
+        finally:
+            snapshots.SNAPSHOT_DIR = snapshotDir
+    return results
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(prog = "python -m friction.bench", description = "Time the page hot paths on synthetic data")
+    parser.add_argument("--sizes", type = int, nargs = "+", default = SIZES, help = "row counts")
+    parser.add_argument("--repeat", type = int, default = 3, help = "runs per stage, the best is kept")
+    parser.add_argument("--stages", nargs = "*", help = "only these stages")
+    parser.add_argument("--out", default = "benchmarks.jsonl", help = "results are appended to this file")
+    args = parser.parse_args(argv)
+    tag = {"run": datetime.datetime.now().isoformat(timespec = "seconds"), "commit": commit(), "repeat": args.repeat}
+    results = run(args.sizes, args.repeat, args.stages)
+    with open(args.out, "a") as f:
+        for result in results:
+            f.write(json.dumps({**tag, **result})+"\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Bootstrap prediction intervals
+
+Projects (rows sharing the cluster columns, by default the control section
+DISTR/CONT) are resampled with replacement; each replicate is a vector of
+counts per project. Two ways to get the coefficient vector of a replicate:
+
+- "perturb": one Gauss-Newton step from the stored vector on the resampled
+  rows. The normal equations are additive over projects, so the per-project
+  J'J and J'r are summed once and every replicate is a weighted sum of them
+  followed by one batched pseudo-inverse solve.
+- "refit": a full least-squares fit per replicate, spread over a process pool.
+
+All replicate vectors are then evaluated at once over the AGE grid for the
+mean feature row of each group (district, pavement type, ...), and the
+percentile bands are taken across replicates.
+"""
+import concurrent.futures
+import multiprocessing
+
+import numpy as np
+
+from friction.fit import fitData, fitSpec, jacobian
+from friction.models import TERMS, coefMatrix, curve, specFeatures
+
+
+def clusterCodes(data, by):
+    """Project code of every row (rows sharing the by columns) and the number of projects"""
+    codes = data.groupby(list(by), sort = False, observed = True).ngroup().to_numpy()
+    return codes, int(codes.max())+1 if len(codes) else 0
+
+
+def resampleCounts(n_clusters, replicates, seed = 0):
+    """(replicates x n_clusters) draw counts of each project per bootstrap replicate"""
+    rng = np.random.default_rng(seed)
+    picked = rng.integers(0, n_clusters, size = (replicates, n_clusters))
+    picked += np.arange(replicates)[:, None]*n_clusters
+    return np.bincount(picked.ravel(), minlength = replicates*n_clusters).reshape(replicates, n_clusters).astype(np.float64)
+
+
+def perturbReplicates(spec, x, X, age, y, features, codes, counts, chunk = 16384):
+    """(replicates x len(spec)) one-step Gauss-Newton updates of x on each resample"""
+    x = np.asarray(x, dtype = np.float64)
+    J = jacobian(spec, x, X, age, features)
+    r = y-curve(X @ coefMatrix(spec, x, features), age)
+    p = J.shape[1]
+    # per-project normal equations, then a count-weighted sum per replicate
+    G = np.zeros((counts.shape[1], p*p))
+    g = np.zeros((counts.shape[1], p))
+    order = np.argsort(codes, kind = "stable")
+    for s in range(0, len(order), chunk):
+        rows = order[s:s+chunk]
+        code = codes[rows]
+        first = np.flatnonzero(np.r_[True, code[1:] != code[:-1]])  # codes are sorted, one segment each
+        Jc = J[rows]
+        G[code[first]] += np.add.reduceat((Jc[:, :, None]*Jc[:, None, :]).reshape(len(rows), p*p), first)
+        g[code[first]] += np.add.reduceat(Jc*r[rows, None], first)
+    H = (counts @ G).reshape(-1, p, p)
+    step = np.linalg.pinv(H, hermitian = True) @ (counts @ g)[:, :, None]
+    return x+step[:, :, 0]
+
+
+# rows of the fit and the project of each row, set once per worker process by the pool initializer
+_shared = {}
+
+
+def _share(X, age, y, features, order, starts):
+    _shared.update(X = X, age = age, y = y, features = features, order = order, starts = starts)
+
+
+def resampleRows(order, starts, k):
+    """Row positions of one resample: the rows of project c (order[starts[c]:starts[c+1]]) k[c] times"""
+    sizes = np.repeat(np.diff(starts), k.astype(np.intp))
+    first = np.repeat(starts[:-1], k.astype(np.intp))
+    offset = np.arange(sizes.sum())-np.repeat(np.cumsum(sizes)-sizes, sizes)
+    return order[np.repeat(first, sizes)+offset]
+
+
+def _refitReplicate(spec, x, k, kwargs):
+    rows = resampleRows(_shared["order"], _shared["starts"], k)
+    return fitSpec(spec, [x], _shared["X"][rows], _shared["age"][rows], _shared["y"][rows], _shared["features"], **kwargs)[0]
+
+
+def refitReplicates(spec, x, X, age, y, features, codes, counts, workers = None, **kwargs):
+    """
+    (replicates x len(spec)) least-squares refits of x on each resample. The
+    rows are handed to each worker once; tasks carry only their count vector.
+    """
+    order = np.argsort(codes, kind = "stable")
+    starts = np.searchsorted(codes[order], np.arange(counts.shape[1]+1))
+    shared = (X, age, y, features, order, starts)
+    if workers is None or workers <= 1:
+        _share(*shared)
+        return np.array([_refitReplicate(spec, x, k, kwargs) for k in counts])
+    with concurrent.futures.ProcessPoolExecutor(max_workers = workers, initializer = _share, initargs = shared,
+                                                mp_context = multiprocessing.get_context("spawn")) as pool:  # see fit.refit
+        chunk = max(1, len(counts)//(4*workers))
+        return np.array(list(pool.map(_refitReplicate, [spec]*len(counts), [x]*len(counts), counts, [kwargs]*len(counts),
+                                      chunksize = chunk)))
+
+
+def replicateCurves(spec, coefs, Xg, features, ages):
+    """SN of every replicate vector for every group feature row at every age, (replicates x groups x ages)"""
+    # coefMatrix is linear in x: one (len(spec) x n_features*4) map scatters all replicates at once
+    M = np.stack([coefMatrix(spec, e, features).ravel() for e in np.eye(len(spec))])
+    W = (coefs @ M).reshape(len(coefs), len(features), len(TERMS))
+    P = np.einsum("gf,bft->bgt", Xg, W)
+    return curve(P[:, :, None, :], np.asarray(ages, dtype = np.float64)[None, None, :])
+
+
+def predictionBands(spec, x, data, group, ages, by = ("DISTR", "CONT"), replicates = 1000, q = (0.05, 0.5, 0.95),
+                    mode = "perturb", observed = "SN_cummin", seed = 0, workers = None):
+    """
+    Bootstrap percentile bands of predicted SN vs. AGE for each value of the group column.
+    Returns {"groups": group values, "ages": ages, "bands": (len(q) x n_groups x n_ages)},
+    None when no row has every value present.
+    """
+    rows = data.dropna(subset = [feat for feat in specFeatures(spec) if feat != "const"]+["AGE", observed])
+    if len(rows) == 0:
+        return None
+    X, age, y, features = fitData(rows, [spec], observed)
+    codes, n_clusters = clusterCodes(rows, by)
+    counts = resampleCounts(n_clusters, replicates, seed)
+    if mode == "perturb":
+        coefs = perturbReplicates(spec, x, X, age, y, features, codes, counts)
+    elif mode == "refit":
+        coefs = refitReplicates(spec, x, X, age, y, features, codes, counts, workers = workers, max_nfev = 20)
+    else:
+        raise ValueError("unknown bootstrap mode "+repr(mode))
+    labels, g = np.unique(rows[group].astype(str).to_numpy(), return_inverse = True)
+    Xg = np.zeros((len(labels), len(features)))
+    np.add.at(Xg, g, X)
+    Xg /= np.bincount(g, minlength = len(labels))[:, None]
+    curves = replicateCurves(spec, coefs, Xg, features, ages)
+    return {"groups": labels, "ages": np.asarray(ages, dtype = np.float64),
+            "bands": np.nanquantile(curves, q, axis = 0)}
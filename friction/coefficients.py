@@ -0,0 +1,105 @@
+"""
+Coefficient registry
+
+Fitted coefficient vectors live in assets/coefficients.json, one entry per
+(approach, model, version) with the "term:feature" name of every coefficient.
+The file is read once per process; every entry is checked against the model
+layout it belongs to and turned into a read-only float64 array.
+
+A coefficient set is the dict {approach: {model: x}} the pages and the batch
+helpers take: for each (approach, model) the newest version, or the newest
+version not above a given one. District-a/District-b entries hold only the
+district effects, their names are checked against the district part of the
+layout.
+"""
+import functools
+import json
+import os
+
+import numpy as np
+
+from friction.models import MODELS, modelSpec
+
+
+REGISTRY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets", "coefficients.json")
+
+
+def featureNames(approach, model):
+    """"term:feature" name of each coefficient stored for (approach, model), following models.variant"""
+    if approach.startswith("District-"):
+        spec = modelSpec(model, approach[-1])[len(MODELS[model+"_v1"]):]
+    elif approach == "remove_facility":
+        spec = MODELS[model+"_v1"]
+    else:
+        spec = MODELS[model]
+    return [term+":"+feat for term, feat in spec]
+
+
+def validate(entry):
+    """Read-only coefficient array of a registry entry, ValueError if it does not fit its model"""
+    approach, model = entry["approach"], entry["model"]
+    names = featureNames(approach, model)
+    if entry["features"] != names:
+        raise ValueError("%s %s v%s: features %s do not match the model layout %s"
+                         % (approach, model, entry["version"], entry["features"], names))
+    coef = np.asarray(entry["coef"], dtype = np.float64)
+    if coef.shape != (len(names),):
+        raise ValueError("%s %s v%s: expected %d coefficients, got %d"
+                         % (approach, model, entry["version"], len(names), coef.size))
+    coef.flags.writeable = False
+    return coef
+
+
+@functools.lru_cache(maxsize = 4)
+def loadRegistry(path = REGISTRY_PATH):
+    """{(approach, model): {version: coef}} of the registry file, read and validated once per process"""
+    with open(path) as f:
+        registry = json.load(f)
+    entries = {}
+    for entry in registry["entries"]:
+        entries.setdefault((entry["approach"], entry["model"]), {})[entry["version"]] = validate(entry)
+    return entries
+
+
+def coefficientSet(version = None, path = REGISTRY_PATH):
+    """
+    {approach: {model: x}} with the newest version of every entry, or the
+    newest version not above version. Entries without such a version are left out.
+    """
+    coefs = {}
+    for (approach, model), versions in loadRegistry(path).items():
+        usable = [v for v in versions if version is None or v <= version]
+        if usable:
+            coefs.setdefault(approach, {})[model] = versions[max(usable)]
+    return coefs
+
+
+def writeRegistry(registry, f):
+    """Registry json with one entry per line, so a new version shows up as added lines in a diff"""
+    f.write('{"entries": [\n')
+    f.write(",\n".join(json.dumps(entry) for entry in registry["entries"]))
+    f.write("\n]}\n")
+
+
+def addVersion(coefs, path = REGISTRY_PATH, note = None):
+    """
+    Append every entry of a coefficient set (e.g. a refit) to the registry
+    file as the next version of its (approach, model). Returns the version.
+    """
+    with open(path) as f:
+        registry = json.load(f)
+    version = 1+max((entry["version"] for entry in registry["entries"]), default = 0)
+    for approach in coefs:
+        for model, x in coefs[approach].items():
+            entry = {"approach": approach, "model": model, "version": version,
+                     "features": featureNames(approach, model),
+                     "coef": [float(v) for v in x]}
+            if note is not None:
+                entry["note"] = note
+            validate(entry)
+            registry["entries"].append(entry)
+    with open(path+".tmp", "w") as f:
+        writeRegistry(registry, f)
+    os.replace(path+".tmp", path)
+    loadRegistry.cache_clear()
+    return version
@@ -0,0 +1,330 @@
+"""
+Local snapshot cache of the MySQL tables
+
+Each table is written once to an uncompressed Arrow IPC file with downcast
+columns. Later loads memory-map the file instead of running SELECT * again,
+so a cold start does not wait on the database, and worker processes on the
+same host share the mapped pages through the OS page cache.
+
+Tables with a high-water mark column (an auto-increment id or a last-modified
+timestamp) can be refreshed incrementally: only rows past the stored mark are
+queried and merged into the snapshot by key, keeping the position of every
+existing row so row selections taken before the refresh stay valid.
+"""
+import collections
+import functools
+import json
+import os
+import tempfile
+import threading
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+from friction.index import buildIndex, selectRows
+from friction.models import DISTRICTS
+
+
+# version of the column typing below; snapshots written with another one are retyped once
+SCHEMA_VERSION = 3
+
+# label columns always stored as categoricals, whatever their cardinality
+CATEGORICAL = ["DISTR", "CONT", "HIGHWAY_FUN", "PAV_TYPE", "District_Name", "County_Name"]
+
+# 0/1 indicator columns (one-hot facility/pavement and district dummies), stored as int8
+INDICATORS = ["SH", "US", "IH", "AC_Thick", "COM", "JCP", "CRCP"]+DISTRICTS
+
+SNAPSHOT_DIR = os.environ.get("FRIC_SNAPSHOT_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "snapshots"))
+
+
+def snapshotPath(table):
+    return os.path.join(SNAPSHOT_DIR, table+".arrow")
+
+
+_locks = collections.defaultdict(threading.RLock)
+_locksLock = threading.Lock()
+
+
+def tableLock(table):
+    """Lock serializing snapshot creation and refresh of table between the sessions of this process"""
+    with _locksLock:
+        return _locks[table]
+
+
+def downcast(data):
+    """
+    Typed, compact columns: object columns holding only numbers become numeric,
+    label columns (CATEGORICAL) and other repetitive strings become categoricals,
+    the INDICATORS columns become int8 when they hold only 0/1, integers take
+    the smallest integer type and floats become float32 when that does not
+    change any value. Strings are left as text, "#NAME?" cleaned columns included.
+    """
+    data = data.infer_objects()
+    for col in data.columns:
+        s = data[col]
+        if s.dtype == object or pd.api.types.is_string_dtype(s.dtype):
+            if col in CATEGORICAL or s.nunique() <= len(s)//2:
+                data[col] = s.astype("category")
+        elif pd.api.types.is_bool_dtype(s.dtype):
+            data[col] = s.astype(np.int8)
+        elif pd.api.types.is_integer_dtype(s.dtype):
+            data[col] = pd.to_numeric(s, downcast = "integer")
+        elif pd.api.types.is_float_dtype(s.dtype):
+            values = s.to_numpy()
+            if col in INDICATORS and not np.isnan(values).any() and np.isin(values, (0.0, 1.0)).all():
+                data[col] = values.astype(np.int8)
+                continue
+            small = values.astype(np.float32)
+            if np.array_equal(small.astype(values.dtype), values, equal_nan = True):
+                data[col] = small
+    return data
+
+
+def writeSnapshot(table, data, meta = None):
+    """
+    Write data to the snapshot file of table, replacing the old file atomically.
+    meta is a json-able dict kept in the file schema (watermark, version),
+    the schema version of the column typing is added to it
+    """
+    os.makedirs(SNAPSHOT_DIR, exist_ok = True)
+    path = snapshotPath(table)
+    arrow = pa.Table.from_pandas(data.reset_index(drop = True), preserve_index = False)
+    arrow = arrow.replace_schema_metadata({**arrow.schema.metadata, b"snapshot": json.dumps({**(meta or {}), "schema": SCHEMA_VERSION}, default = str)})
+    fd, tmp = tempfile.mkstemp(dir = SNAPSHOT_DIR, prefix = table+".", suffix = ".tmp")  # unique, concurrent writers do not share it
+    os.close(fd)
+    try:
+        feather.write_feather(arrow, tmp, compression = "uncompressed")
+        os.replace(tmp, path)
+    except BaseException:
+        os.remove(tmp)
+        raise
+
+
+def snapshotMeta(table):
+    """Metadata dict stored with the snapshot of table, None if there is none"""
+    path = snapshotPath(table)
+    if not os.path.exists(path):
+        return None
+    with pa.memory_map(path) as source:
+        meta = pa.ipc.open_file(source).schema.metadata or {}
+    return json.loads(meta.get(b"snapshot", b"{}"))
+
+
+def readSnapshot(table, columns = None):
+    """Memory-map the snapshot file of table (only columns if given), None if there is none"""
+    path = snapshotPath(table)
+    if not os.path.exists(path):
+        return None
+    with pa.memory_map(path) as source:
+        arrow = pa.ipc.open_file(source).read_all()
+    if columns is not None:
+        arrow = arrow.select(columns)
+    return arrow.to_pandas(split_blocks = True)
+
+
+def scalar(value):
+    """Plain python value of a numpy/pandas scalar, for json and query parameters"""
+    return value.item() if hasattr(value, "item") else value
+
+
+def mergeRows(data, delta, key):
+    """
+    Merge changed rows into data. Rows whose key already exists are replaced in
+    place, new rows are appended, so existing row positions do not move.
+    """
+    if len(delta) == 0:
+        return data
+    combined = pd.concat([data, delta], ignore_index = True)
+    if key is None:
+        return combined
+    pos = pd.MultiIndex.from_frame(data[key]).get_indexer(pd.MultiIndex.from_frame(delta[key]))
+    hit = pos >= 0
+    take = np.arange(len(data))
+    take[pos[hit]] = len(data) + np.flatnonzero(hit)
+    take = np.concatenate([take, len(data) + np.flatnonzero(~hit)])
+    return combined.take(take).reset_index(drop = True)
+
+
+def refreshTable(conn, table, watermark, key = None, na_values = None):
+    """
+    Pull only the rows of table with watermark above the stored high-water mark
+    and merge them into the snapshot by key (append only when key is None).
+    Falls back to a full load when there is no snapshot or no stored mark.
+    Returns the refreshed table and the number of rows pulled.
+    """
+    meta = snapshotMeta(table)
+    if meta is None or meta.get("watermark") is None:
+        before = datasetHandle(table)
+        data = loadTable(conn, table, na_values = na_values, refresh = True, watermark = watermark)
+        return data, len(data) if datasetHandle(table) != before else 0
+    delta = conn.query('SELECT * from '+table+' WHERE '+watermark+' > :mark;', params = {"mark": meta["watermark"]}, ttl = 0)
+    if len(delta) == 0:
+        return readSnapshot(table), 0
+    if na_values is not None:
+        delta = delta.replace(na_values, np.nan)
+    data = downcast(mergeRows(readSnapshot(table), delta, key))
+    writeSnapshot(table, data, {"watermark": scalar(delta[watermark].max()), "version": meta.get("version", 0)+1})
+    return data, len(delta)
+
+
+def loadTable(conn, table, na_values = None, refresh = False, watermark = None):
+    """
+    Table from the local snapshot, queried from the database and snapshotted
+    when there is no snapshot yet or refresh is set. With a watermark column
+    its maximum is stored as the high-water mark for refreshTable. A refresh
+    that returns the snapshot unchanged keeps its handle: the file is only
+    rewritten to store a missing high-water mark, with the old mtime.
+    """
+    data = None if refresh else readSnapshot(table)
+    if data is None:
+        data = conn.query('SELECT * from '+table+';', ttl = 0)
+        if na_values is not None:
+            data = data.replace(na_values, np.nan)
+        data = downcast(data)
+        mark = scalar(data[watermark].max()) if watermark is not None and len(data) else None
+        meta = snapshotMeta(table) or {}
+        old = readSnapshot(table) if refresh else None
+        if old is not None and old.equals(data):
+            # unchanged: keep the version and mtime, so handle-keyed caches stay valid
+            if mark is not None and meta.get("watermark") is None:
+                stat = os.stat(snapshotPath(table))
+                writeSnapshot(table, old, {**meta, "watermark": mark})
+                os.utime(snapshotPath(table), ns = (stat.st_atime_ns, stat.st_mtime_ns))
+            return old
+        writeSnapshot(table, data, {"watermark": mark, "version": meta.get("version", 0)+1})
+    return data
+
+
+def refreshTables(conn, tables, config, na_values = None):
+    """
+    Refresh the snapshots of tables. config maps a table to its refresh options
+    {"watermark": column, "key": [columns]}; tables without a watermark are reloaded in full.
+    Only tables that changed get a new snapshot version, so cached results of the
+    others stay valid. Returns the number of rows pulled per table, 0 if unchanged.
+    """
+    pulled = {}
+    for table in tables:
+        opts = config.get(table, {})
+        with tableLock(table):
+            if opts.get("watermark") is None:
+                before = datasetHandle(table)
+                data = loadTable(conn, table, na_values = na_values, refresh = True)
+                pulled[table] = len(data) if datasetHandle(table) != before else 0
+            else:
+                _, pulled[table] = refreshTable(conn, table, opts["watermark"], key = opts.get("key"), na_values = na_values)
+    return pulled
+
+
+def selectQuery(table, columns, filters):
+    """
+    Parameterized SELECT of columns from table with one IN predicate per filter.
+    filters maps a column to the allowed values, None means no restriction.
+    Returns the sql text and its parameters.
+    """
+    where, params = [], {}
+    for col, values in filters.items():
+        if values is None:
+            continue
+        if len(values) == 0:
+            where.append("0 = 1")
+            continue
+        names = [col+"_"+str(i) for i in range(len(values))]
+        params.update({name: scalar(value) for name, value in zip(names, values)})
+        where.append("`"+col+"` IN ("+", ".join(":"+name for name in names)+")")
+    sql = "SELECT "+", ".join("`"+col+"`" for col in columns)+" from "+table
+    if where:
+        sql += " WHERE "+" AND ".join(where)
+    return sql+";", params
+
+
+# Cheap, hashable stand-in for a loaded table: cached functions take a handle
+# plus small scalar arguments instead of a DataFrame, so a cache lookup does not
+# hash the data. The version changes whenever the snapshot file is rewritten.
+Dataset = collections.namedtuple("Dataset", ["table", "version"])
+
+
+def datasetHandle(table):
+    """Handle of the current snapshot of table, version None when there is no snapshot"""
+    path = snapshotPath(table)
+    if not os.path.exists(path):
+        return Dataset(table, None)
+    return Dataset(table, (snapshotMeta(table).get("version", 0), os.stat(path).st_mtime_ns))
+
+
+def ensureSnapshot(conn, table, na_values = None):
+    """
+    Handle of table, loading it from the database first when there is no snapshot.
+    A snapshot typed by an older SCHEMA_VERSION is retyped in place, without a query.
+    """
+    handle = datasetHandle(table)
+    if handle.version is not None and snapshotMeta(table).get("schema") == SCHEMA_VERSION:
+        return handle
+    with tableLock(table):  # another session may have written it while we waited
+        handle = datasetHandle(table)
+        if handle.version is None:
+            loadTable(conn, table, na_values = na_values, refresh = True)
+            handle = datasetHandle(table)
+        elif snapshotMeta(table).get("schema") != SCHEMA_VERSION:
+            meta = snapshotMeta(table)
+            writeSnapshot(table, downcast(readSnapshot(table)), {**meta, "version": meta.get("version", 0)+1})
+            handle = datasetHandle(table)
+    return handle
+
+
+def snapshotHandle(conn, table, na_values = None):
+    """
+    ensureSnapshot when the snapshot directory is writable. Otherwise the handle
+    of whatever snapshot is there, version None when there is none: selections
+    are then pushed down to the database (loadSelection, handleData).
+    """
+    try:
+        os.makedirs(SNAPSHOT_DIR, exist_ok = True)
+        if os.access(SNAPSHOT_DIR, os.W_OK):
+            return ensureSnapshot(conn, table, na_values = na_values)
+    except OSError:
+        pass
+    return datasetHandle(table)
+
+
+def handleData(conn, handle, na_values = None):
+    """Table of a handle: the shared snapshot frame, or queried from the database when there is no snapshot"""
+    if handle.version is not None:
+        return datasetData(handle)
+    data = conn.query('SELECT * from '+handle.table+';', ttl = 0)
+    if na_values is not None:
+        data = data.replace(na_values, np.nan)
+    return downcast(data)
+
+
+@functools.lru_cache(maxsize = 16)
+def datasetData(handle):
+    """
+    Table of a snapshot handle, read once per process and version. The same
+    frame is handed to every session and its columns are views of the
+    memory-mapped file, so callers select rows from it and never modify it.
+    """
+    return readSnapshot(handle.table)
+
+
+@functools.lru_cache(maxsize = 8)
+def indexedSnapshot(handle, columns):
+    """Snapshot of a handle with a filter index over columns, built once per process and version"""
+    data = datasetData(handle)
+    return data, buildIndex(data, columns)
+
+
+def loadSelection(conn, table, columns, filters):
+    """
+    Rows of table matching filters, only the given columns. Selects through the
+    filter index of the snapshot when there is one, otherwise pushes the
+    selection down to the database.
+    """
+    columns = list(dict.fromkeys(list(columns)+list(filters)))
+    handle = datasetHandle(table)
+    if handle.version is None:
+        sql, params = selectQuery(table, columns, filters)
+        return downcast(conn.query(sql, params = params, ttl = 0))
+    data, index = indexedSnapshot(handle, tuple(filters))
+    return data[columns].take(selectRows(index, filters)).reset_index(drop = True)
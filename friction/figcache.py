@@ -0,0 +1,71 @@
+"""
+Process-wide figure cache
+
+Finished figures are kept as plotly JSON text under a short digest of what
+they were built from (page, filter selection, approach, model, coefficient
+vector). Repeat views of a selection skip both the computation and the
+figure construction. Entries are evicted least recently used once the
+total JSON size passes FIGURE_CACHE_MB. Lookups report hit/miss and the JSON
+size to the enclosing perf stage.
+"""
+import collections
+import hashlib
+import json
+import os
+import threading
+
+import numpy as np
+
+from friction.perf import miss, payload
+
+
+FIGURE_CACHE_MB = float(os.environ.get("FRIC_FIGURE_CACHE_MB", "64"))
+
+_figures = collections.OrderedDict()
+_size = 0
+_lock = threading.Lock()
+
+
+def figureKey(*parts):
+    """Digest of the parts a figure depends on; arrays are hashed by their bytes"""
+    h = hashlib.blake2b(digest_size = 16)
+    for part in parts:
+        if isinstance(part, np.ndarray):
+            h.update(part.dtype.str.encode())
+            h.update(np.ascontiguousarray(part).tobytes())
+        else:
+            h.update(repr(part).encode())
+        h.update(b"\x00")
+    return h.hexdigest()
+
+
+def cachedFigure(key, build):
+    """
+    Figure dict for key, from the cache or by calling build() for a plotly
+    figure and caching its JSON. The dict can be passed to st.plotly_chart.
+    """
+    global _size
+    with _lock:
+        text = _figures.get(key)
+        if text is not None:
+            _figures.move_to_end(key)
+    if text is None:
+        miss()
+        text = build().to_json()
+        with _lock:
+            if key not in _figures:
+                _figures[key] = text
+                _size += len(text)
+            while _size > FIGURE_CACHE_MB*2**20 and len(_figures) > 1:
+                _, old = _figures.popitem(last = False)
+                _size -= len(old)
+    payload(len(text))
+    return json.loads(text)
+
+
+def clearFigures():
+    """Drop every cached figure, e.g. after a data refresh"""
+    global _size
+    with _lock:
+        _figures.clear()
+        _size = 0
@@ -0,0 +1,149 @@
+"""
+Refitting model coefficients to the current data
+
+Each (approach, model) variant is fitted to SN_cummin by nonlinear least
+squares with the analytic Jacobian of SN = a + b*exp(-c*(AGE-t0)): the
+derivative of SN by a coefficient is the derivative by its term times its
+feature column. Fits start from the best of the stored coefficient vectors
+(by initial cost), so a diverged stored vector does not poison the refit.
+
+Variants are fitted in parallel on a process pool; the shared feature
+matrix is sent to each worker once. District variants keep the
+remove_facility coefficients fixed and fit only the 13 district effects, so
+they run after remove_facility and use its refitted vector.
+"""
+import concurrent.futures
+import multiprocessing
+
+import numpy as np
+from scipy.optimize import least_squares
+
+from friction.models import TERMS, coefMatrix, curve, featureMatrix, variant
+
+
+def jacobian(spec, x, X, age, features):
+    """(n_rows x len(spec)) derivatives of SN by each coefficient"""
+    P = X @ coefMatrix(spec, x, features)
+    a, b, c, t0 = P.T
+    dt = age-t0
+    e = np.exp(-c*dt)
+    dterm = np.stack([np.ones_like(e), e, -b*dt*e, b*c*e], axis = 1)
+    col = {feat: j for j, feat in enumerate(features)}
+    return dterm[:, [TERMS.index(term) for term, _ in spec]]*X[:, [col[feat] for _, feat in spec]]
+
+
+def fitSpec(spec, starts, X, age, y, features, free = None, **kwargs):
+    """
+    Least-squares fit of the coefficients of spec, starting from the start
+    vector with the lowest cost. Only the coefficients where free is set are
+    fitted, the rest keep their start values.
+    Returns the fitted vector and a report dict (cost, rmse, nfev, status).
+    """
+    free = np.ones(len(spec), dtype = bool) if free is None else np.asarray(free, dtype = bool)
+
+    def full(theta, x0):
+        x = x0.copy()
+        x[free] = theta
+        return x
+
+    def fun(theta, x0):
+        return curve(X @ coefMatrix(spec, full(theta, x0), features), age)-y
+
+    def jac(theta, x0):
+        return jacobian(spec, full(theta, x0), X, age, features)[:, free]
+
+    def cost(x0):
+        with np.errstate(over = "ignore", invalid = "ignore"):
+            r = fun(x0[free], x0)
+        return np.inf if not np.all(np.isfinite(r)) else 0.5*np.dot(r, r)
+
+    starts = [np.asarray(s, dtype = np.float64) for s in starts]
+    x0 = min(starts, key = cost)
+    result = least_squares(fun, x0[free], jac = jac, args = (x0,), x_scale = "jac", **kwargs)
+    x = x0.copy()
+    x[free] = result.x
+    return x, {"cost": float(result.cost), "rmse": float(np.sqrt(2*result.cost/len(y))),
+               "nfev": int(result.nfev), "status": int(result.status)}
+
+
+# shared fit data of each pool worker, set once by the pool initializer
+_shared = {}
+
+
+def _share(X, age, y, features):
+    _shared.update(X = X, age = age, y = y, features = features)
+
+
+def _fitTask(spec, starts, free, kwargs):
+    return fitSpec(spec, starts, _shared["X"], _shared["age"], _shared["y"], _shared["features"], free = free, **kwargs)
+
+
+def fitData(data, specs, observed = "SN_cummin"):
+    """Feature matrix, AGE and observed SN of the rows with every value present"""
+    features = list(dict.fromkeys(feat for spec in specs for _, feat in spec))
+    X = featureMatrix(data, features)
+    age = data["AGE"].to_numpy(dtype = np.float64)
+    y = data[observed].to_numpy(dtype = np.float64)
+    keep = np.isfinite(X).all(axis = 1) & np.isfinite(age) & np.isfinite(y)
+    return np.ascontiguousarray(X[keep]), age[keep], y[keep], features
+
+
+def refit(x, data, starts = (), variants = None, observed = "SN_cummin", workers = None, **kwargs):
+    """
+    Refit every (approach, model) entry of the coefficient dict x to data.
+    starts are other coefficient dicts (like x1) whose entries are tried as
+    start vectors too; district effects may also start from zero.
+    Returns a coefficient dict shaped like x and a report per variant.
+    """
+    if variants is None:
+        variants = [(approach, model) for approach in x for model in x[approach]]
+    dicts = [x]+list(starts)
+    specs = {v: variant(x, *v)[0] for v in variants}
+    X, age, y, features = fitData(data, list(specs.values()), observed)
+
+    def entries(approach, model):
+        return [d[approach][model] for d in dicts if model in d.get(approach, {})]
+
+    fitted = {approach: {} for approach, _ in variants}
+    report = {}
+    pool = None
+    if workers is not None and workers > 1:
+        # spawned, not forked: forking the multi-threaded Streamlit server can deadlock on a held lock
+        pool = concurrent.futures.ProcessPoolExecutor(max_workers = workers, initializer = _share, initargs = (X, age, y, features),
+                                                      mp_context = multiprocessing.get_context("spawn"))
+    else:
+        _share(X, age, y, features)
+    submit = pool.submit if pool is not None else lambda f, *args: _Done(f(*args))
+    try:
+        # stage 1: models with all coefficients free
+        jobs = {v: submit(_fitTask, specs[v], entries(*v), None, kwargs)
+                for v in variants if not v[0].startswith("District-")}
+        for (approach, model), job in jobs.items():
+            fitted[approach][model], report[(approach, model)] = job.result()
+        # stage 2: district effects on top of the refitted remove_facility model
+        jobs = {}
+        for approach, model in variants:
+            if not approach.startswith("District-"):
+                continue
+            spec = specs[(approach, model)]
+            base = fitted.get("remove_facility", {}).get(model, x["remove_facility"][model])
+            vectors = [np.concatenate([base, e]) for e in entries(approach, model)]
+            vectors.append(np.concatenate([base, np.zeros(len(spec)-len(base))]))
+            free = np.arange(len(spec)) >= len(base)
+            jobs[(approach, model)] = (len(base), submit(_fitTask, spec, vectors, free, kwargs))
+        for (approach, model), (n, job) in jobs.items():
+            full, report[(approach, model)] = job.result()
+            fitted[approach][model] = full[n:]
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return fitted, report
+
+
+class _Done:
+    """Finished stand-in for a future when fitting in-process"""
+    def __init__(self, value):
+        self.value = value
+
+    def result(self):
+        return self.value
@@ -0,0 +1,75 @@
+"""
+Texas county boundaries for the choropleths
+
+The boundaries are bundled as assets/tx_counties.geojson: the 254 Texas
+counties (state FIPS 48) of the census county shapefile shipped with
+plotly-geo, simplified and rounded. They are read once per process and
+shared by every figure, so the pages need no network access and the
+figures only carry Texas geometry.
+
+Rebuild the asset with
+    python -m friction.geo [tolerance]
+"""
+import functools
+import json
+import os
+import sys
+
+
+ASSET = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets", "tx_counties.geojson")
+
+# simplification tolerance of the bundled asset, in degrees
+ASSET_TOLERANCE = 0.002
+
+TX_FIPS = "48"
+
+
+def roundCoords(coords, digits):
+    if isinstance(coords[0], (int, float)):
+        return [round(c, digits) for c in coords]
+    return [roundCoords(c, digits) for c in coords]
+
+
+def simplifyGeometry(geometry, tolerance, digits = 4):
+    """Simplified GeoJSON geometry, coordinates rounded to digits"""
+    from shapely.geometry import mapping, shape
+    simple = shape(geometry).simplify(tolerance, preserve_topology = True)
+    return {"type": simple.geom_type, "coordinates": roundCoords(mapping(simple)["coordinates"], digits)}
+
+
+def buildCounties(path = ASSET, tolerance = ASSET_TOLERANCE):
+    """Write the Texas county asset from the plotly-geo county shapefile"""
+    import shapefile
+    import _plotly_geo
+    source = os.path.join(os.path.dirname(_plotly_geo.__file__), "package_data", "cb_2016_us_county_500k")
+    features = []
+    with shapefile.Reader(source) as reader:
+        for rec in reader.iterShapeRecords():
+            if rec.record["STATEFP"] != TX_FIPS:
+                continue
+            features.append({"type": "Feature",
+                             "id": rec.record["GEOID"],
+                             "properties": {"NAME": rec.record["NAME"]},
+                             "geometry": simplifyGeometry(rec.shape.__geo_interface__, tolerance)})
+    features.sort(key = lambda f: f["id"])
+    os.makedirs(os.path.dirname(path), exist_ok = True)
+    with open(path, "w") as f:
+        json.dump({"type": "FeatureCollection", "features": features}, f, separators = (",", ":"))
+
+
+@functools.lru_cache(maxsize = 4)
+def loadCounties(tolerance = ASSET_TOLERANCE):
+    """
+    Texas county GeoJSON, loaded once per process. A tolerance above the
+    bundled one simplifies further (needs shapely).
+    """
+    with open(ASSET) as f:
+        counties = json.load(f)
+    if tolerance > ASSET_TOLERANCE:
+        for feature in counties["features"]:
+            feature["geometry"] = simplifyGeometry(feature["geometry"], tolerance)
+    return counties
+
+
+if __name__ == "__main__":
+    buildCounties(tolerance = float(sys.argv[1]) if len(sys.argv) > 1 else ASSET_TOLERANCE)
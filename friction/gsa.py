@@ -0,0 +1,108 @@
+"""
+Global sensitivity analysis of the friction models
+
+Inputs are drawn over the unit hypercube, one dimension per variable in
+sweep.VARIABLES: continuous variables scale linearly onto RANGES, categorical
+ones pick a level by equal-width bins. Sample points become feature rows
+through the same level columns as the sweep designs and are evaluated in
+chunks, optionally spread over a process pool.
+
+sobolIndices: Saltelli sampling on a scrambled Sobol sequence, first-order
+indices by the Saltelli (2010) estimator and total-order by Jansen.
+morrisEffects: Morris trajectories on a p-level grid, mu* and sigma of the
+elementary effects per unit of the normalized input range.
+"""
+import concurrent.futures
+import multiprocessing
+
+import numpy as np
+from scipy.stats import qmc
+
+from friction.models import coefMatrix, curve
+from friction.sweep import CATEGORIES, FEATURES, LEVELS, VARIABLES, levelColumns
+
+
+# input ranges of the continuous variables, levels of the categorical ones
+RANGES = {"PAV_TYPE": LEVELS["PAV_TYPE"],
+          "HIGHWAY_FUN": LEVELS["HIGHWAY_FUN"],
+          "AADT": (2000, 15000),
+          "TRUCK_PCT": (10, 25),
+          "tavg": (56, 72),
+          "prcp": (33, 45)}
+
+
+def unitFeatures(U, ranges = RANGES):
+    """Feature matrix of unit-cube samples U (n x len(VARIABLES))"""
+    X = np.zeros((len(U), len(FEATURES)), dtype = np.float64)
+    X[:, FEATURES.index("const")] = 1.0
+    for j, var in enumerate(VARIABLES):
+        if var in CATEGORIES:
+            k = len(ranges[var])
+            idx = np.minimum((U[:, j]*k).astype(np.intp), k-1)
+            X += levelColumns(var, ranges[var])[idx]
+        else:
+            lo, hi = ranges[var]
+            X[:, FEATURES.index(var)] = lo+U[:, j]*(hi-lo)
+    return X
+
+
+def evaluateChunk(spec, x, U, ages, ranges):
+    """SN of unit-cube samples U at each age, (n x n_ages)"""
+    P = unitFeatures(U, ranges) @ coefMatrix(spec, x, FEATURES)
+    return curve(P[:, None, :], ages[None, :])
+
+
+def evaluate(spec, x, U, ages, ranges = RANGES, chunk = 65536, workers = None):
+    """evaluateChunk over U in chunks of rows, on a process pool when workers > 1"""
+    ages = np.asarray(ages, dtype = np.float64)
+    starts = range(0, len(U), chunk)
+    if workers is None or workers <= 1 or len(starts) <= 1:
+        parts = [evaluateChunk(spec, x, U[s:s+chunk], ages, ranges) for s in starts]
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers = workers, mp_context = multiprocessing.get_context("spawn")) as pool:
+            parts = list(pool.map(evaluateChunk, *zip(*[(spec, x, U[s:s+chunk], ages, ranges) for s in starts])))
+    return np.concatenate(parts) if parts else np.empty((0, len(ages)))
+
+
+def sobolIndices(spec, x, ages, n = 2**14, ranges = RANGES, seed = 0, workers = None):
+    """
+    First- and total-order Sobol indices of every variable at every age.
+    Uses n*(d+2) model evaluations; n should be a power of two.
+    Returns (S1, ST), each (len(VARIABLES) x n_ages).
+    """
+    d = len(VARIABLES)
+    AB = qmc.Sobol(2*d, scramble = True, seed = seed).random(n)
+    A, B = AB[:, :d], AB[:, d:]
+    U = np.empty(((d+2)*n, d))
+    U[:n], U[n:2*n] = A, B
+    for i in range(d):
+        ABi = A.copy()
+        ABi[:, i] = B[:, i]
+        U[(2+i)*n:(3+i)*n] = ABi
+    Y = evaluate(spec, x, U, ages, ranges, workers = workers).reshape(d+2, n, -1)
+    YA, YB, YAB = Y[0], Y[1], Y[2:]
+    V = np.var(np.concatenate([YA, YB]), axis = 0)
+    V = np.where(V > 0, V, np.nan)
+    S1 = np.mean(YB*(YAB-YA), axis = 1)/V
+    ST = 0.5*np.mean((YA-YAB)**2, axis = 1)/V
+    return S1, ST
+
+
+def morrisEffects(spec, x, ages, r = 100, p = 4, ranges = RANGES, seed = 0, workers = None):
+    """
+    Morris screening with r trajectories on a p-level grid.
+    Returns (mu_star, sigma), each (len(VARIABLES) x n_ages).
+    """
+    d = len(VARIABLES)
+    rng = np.random.default_rng(seed)
+    delta = p/(2*(p-1))
+    # start points on the grid low enough for one +delta step in every dimension
+    starts = rng.integers(0, p//2, size = (r, d))/(p-1)
+    order = np.argsort(rng.random((r, d)), axis = 1)
+    steps = np.zeros((r, d+1, d))
+    steps[np.arange(r)[:, None], np.arange(1, d+1)[None, :], order] = delta
+    U = starts[:, None, :]+np.cumsum(steps, axis = 1)
+    Y = evaluate(spec, x, U.reshape(-1, d), ages, ranges, workers = workers).reshape(r, d+1, -1)
+    EE = np.empty((r, d, Y.shape[2]))
+    EE[np.arange(r)[:, None], order] = (Y[:, 1:]-Y[:, :-1])/delta
+    return np.abs(EE).mean(axis = 0), EE.std(axis = 0, ddof = 1)
@@ -0,0 +1,67 @@
+"""
+Row index for the sidebar filters
+
+Built once per loaded table: every filter column is stored as categorical
+codes plus its rows sorted by code, so the rows of one value are a contiguous
+slice. A selection starts from the rows of the most selective column and
+checks the other columns through a per-code lookup table, so a narrow choice
+(one district, a few CONT) only touches its own rows and a wide one costs one
+gather over small integer codes instead of an isin over strings.
+"""
+import numpy as np
+import pandas as pd
+
+
+def buildIndex(data, columns):
+    """Filter index of the given columns of data"""
+    index = {"n": len(data)}
+    for col in columns:
+        cat = pd.Categorical(data[col])
+        codes = cat.codes+1  # 0 for missing values
+        order = np.argsort(codes, kind = "stable")
+        counts = np.bincount(codes, minlength = len(cat.categories)+1)
+        index[col] = {"values": cat.categories,
+                      "codes": codes,
+                      "order": order,
+                      "offsets": np.concatenate([[0], np.cumsum(counts)])}
+    return index
+
+
+def allowedCodes(entry, values):
+    """Boolean lookup table over codes (0 is missing) of the selected values"""
+    allowed = np.zeros(len(entry["values"])+1, dtype = bool)
+    allowed[1:] = entry["values"].isin(values)
+    return allowed
+
+
+def selectRows(index, filters):
+    """
+    Sorted row numbers matching every filter. filters maps a column to the
+    allowed values, None means no restriction, same as in loadSelection.
+    """
+    active = []
+    for col, values in filters.items():
+        if values is None:
+            continue
+        allowed = allowedCodes(index[col], values)
+        if allowed[np.diff(index[col]["offsets"]) > 0].all():
+            continue  # every value present in the column is selected
+        active.append((col, allowed))
+    if not active:
+        return np.arange(index["n"])
+    # start from the column with the fewest matching rows
+    sizes = [np.diff(index[col]["offsets"])[allowed].sum() for col, allowed in active]
+    first = int(np.argmin(sizes))
+    if sizes[first]*8 < index["n"]:
+        col, allowed = active.pop(first)
+        entry = index[col]
+        starts, ends = entry["offsets"][:-1][allowed], entry["offsets"][1:][allowed]
+        rows = np.sort(np.concatenate([entry["order"][s:e] for s, e in zip(starts, ends)] or [np.empty(0, dtype = np.intp)]))
+        for col, allowed in active:
+            rows = rows[allowed[index[col]["codes"][rows]]]
+        return rows
+    # wide selection: one mask over all rows
+    mask = np.ones(index["n"], dtype = bool)
+    for col, allowed in active:
+        mask &= allowed[index[col]["codes"]]
+    return np.flatnonzero(mask)
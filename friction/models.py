@@ -0,0 +1,254 @@
+"""
+Friction performance models
+
+Every model has the form SN = a + b*exp(-c*(AGE-t0)), where a, b, c and t0 are
+linear in the segment features. A model is stored as the (term, feature) pair
+of each coefficient, so a fitted coefficient vector x can be scattered into a
+(n_features x 4) matrix W. The four terms for all rows are then one matmul
+X @ W over a float64 feature matrix, followed by one exp.
+
+District effects are not part of the matmul: the coefficients on the 13
+district dummies become a lookup table by district code, and each row adds
+the row of its district, instead of 13 dummy columns times 4 terms.
+"""
+import numpy as np
+
+
+# District dummy columns, in the order of the District-a/District-b coefficients
+DISTRICTS = ['DAL', 'AMA', 'HOU', 'PAR', 'WFS', 'BRY', 'CRP', 'SAT', 'YKM', 'ODA', 'BMT', 'LFK', 'AUS']
+
+# District_Name of each district dummy
+DISTRICT_NAMES = {"DAL": "Dallas", "AMA": "Amarillo", "HOU": "Houston", "PAR": "Paris", "WFS": "Wichita Falls",
+                  "BRY": "Bryan", "CRP": "Corpus Christi", "SAT": "San Antonio", "YKM": "Yoakum", "ODA": "Odessa",
+                  "BMT": "Beaumont", "LFK": "Lufkin", "AUS": "Austin"}
+
+TERMS = ("a", "b", "c", "t0")
+
+
+def layout(terms):
+    """(term, feature) pair of each coefficient from the feature lists of each term"""
+    return [(term, feat) for term in TERMS for feat in terms.get(term, [])]
+
+
+# (term, feature) layout of each model, in the order of the coefficient vector x.
+# "const" is the intercept column.
+MODELS = {name: layout(terms) for name, terms in {
+    # a: const SH US IH
+    # b: const AC_Thick COM JCP CRCP tavg prcp TRUCK_PCT
+    # c: const AADT
+    "m1": {"a": ["const", "SH", "US", "IH"],
+           "b": ["const", "AC_Thick", "COM", "JCP", "CRCP", "tavg", "prcp", "TRUCK_PCT"],
+           "c": ["const", "AADT"]},
+    # a: const SH US IH TRUCK_PCT
+    # b: const AC_Thick COM JCP CRCP tavg prcp
+    # c: const AADT
+    # t0: const
+    "m2": {"a": ["const", "SH", "US", "IH", "TRUCK_PCT"],
+           "b": ["const", "AC_Thick", "COM", "JCP", "CRCP", "tavg", "prcp"],
+           "c": ["const", "AADT"],
+           "t0": ["const"]},
+    # a: const
+    # b: const AC_Thick COM JCP CRCP tavg prcp TRUCK_PCT
+    # c: const AADT
+    "m1_v1": {"a": ["const"],
+              "b": ["const", "AC_Thick", "COM", "JCP", "CRCP", "tavg", "prcp", "TRUCK_PCT"],
+              "c": ["const", "AADT"]},
+    # a: const TRUCK_PCT
+    # b: const AC_Thick COM JCP CRCP tavg prcp
+    # c: const AADT
+    # t0: const
+    "m2_v1": {"a": ["const", "TRUCK_PCT"],
+              "b": ["const", "AC_Thick", "COM", "JCP", "CRCP", "tavg", "prcp"],
+              "c": ["const", "AADT"],
+              "t0": ["const"]},
+}.items()}
+
+
+def modelSpec(model, group_method = None):
+    """
+    Term layout of a model. With group_method "a" or "b" the model is the
+    remove_facility model (m1_v1/m2_v1) with district effects added to that
+    term, and x is the base vector followed by the 13 district coefficients.
+    """
+    if group_method is None:
+        return MODELS[model]
+    return MODELS[model+"_v1"] + [(group_method, dist) for dist in DISTRICTS]
+
+
+def specFeatures(spec):
+    """Distinct features used by a model, in first-use order"""
+    return list(dict.fromkeys(feat for _, feat in spec))
+
+
+def featureMatrix(data, features):
+    """
+    Contiguous float64 (n_rows x n_features) matrix of the given features,
+    "const" becomes a column of ones
+    """
+    X = np.empty((len(data), len(features)), dtype = np.float64)
+    for j, feat in enumerate(features):
+        if feat == "const":
+            X[:, j] = 1.0
+        else:
+            X[:, j] = data[feat].to_numpy(dtype = np.float64)
+    return X
+
+
+def coefMatrix(spec, x, features):
+    """Scatter a coefficient vector x into a (n_features x 4) matrix over `features`"""
+    x = np.asarray(x, dtype = np.float64)
+    if len(x) != len(spec):
+        raise ValueError("expected %d coefficients, got %d" % (len(spec), len(x)))
+    col = {feat: j for j, feat in enumerate(features)}
+    W = np.zeros((len(features), len(TERMS)), dtype = np.float64)
+    for k, (term, feat) in enumerate(spec):
+        W[col[feat], TERMS.index(term)] += x[k]
+    return W
+
+
+def districtCodes(data):
+    """
+    Position in DISTRICTS of the district dummy set on each row, len(DISTRICTS)
+    where none is and len(DISTRICTS)+1 where a dummy is missing
+    """
+    codes = np.full(len(data), len(DISTRICTS), dtype = np.intp)
+    missing = np.zeros(len(data), dtype = bool)
+    for k, dist in enumerate(DISTRICTS):
+        values = data[dist].to_numpy()
+        codes[values == 1] = k
+        if values.dtype.kind == "f":
+            missing |= np.isnan(values)
+    codes[missing] = len(DISTRICTS)+1
+    return codes
+
+
+def splitDistricts(spec, x):
+    """
+    Split the district coefficients off a model: the remaining layout and
+    coefficients, and the (len(DISTRICTS)+2 x 4) term table by district code
+    (zero for rows without a district, NaN for rows with a missing dummy),
+    None without district effects
+    """
+    x = np.asarray(x, dtype = np.float64)
+    if len(x) != len(spec):
+        raise ValueError("expected %d coefficients, got %d" % (len(spec), len(x)))
+    keep = [k for k, (_, feat) in enumerate(spec) if feat not in DISTRICTS]
+    if len(keep) == len(spec):
+        return spec, x, None
+    table = np.zeros((len(DISTRICTS)+2, len(TERMS)), dtype = np.float64)
+    table[-1] = np.nan
+    for k, (term, feat) in enumerate(spec):
+        if feat in DISTRICTS:
+            table[DISTRICTS.index(feat), TERMS.index(term)] += x[k]
+    return [spec[k] for k in keep], x[keep], table
+
+
+def curve(P, age, out = None):
+    """SN = a + b*exp(-c*(AGE-t0)) from the (.. x 4) term array P, written to out if given"""
+    a, b, c, t0 = np.moveaxis(P, -1, 0)
+    sn = np.subtract(age, t0, out = out)
+    sn *= -c
+    np.exp(sn, out = sn)
+    sn *= b
+    sn += a
+    return sn
+
+
+def predict(spec, x, data, X = None, features = None):
+    """Predicted SN for every row of data; X/features cover the non-district features"""
+    spec, x, table = splitDistricts(spec, x)
+    if features is None:
+        features = specFeatures(spec)
+    if X is None:
+        X = featureMatrix(data, features)
+    P = X @ coefMatrix(spec, x, features)
+    if table is not None:
+        P += table[districtCodes(data)]
+    return curve(P, data["AGE"].to_numpy(dtype = np.float64))
+
+
+# Performance model I
+def m1(x, data):
+    return predict(MODELS["m1"], x, data)
+
+
+# Performance model II
+def m2(x, data):
+    return predict(MODELS["m2"], x, data)
+
+
+# Performance model I without facility type
+def m1_v1(x, data):
+    return predict(MODELS["m1_v1"], x, data)
+
+
+# Performance model II without facility type
+def m2_v1(x, data):
+    return predict(MODELS["m2_v1"], x, data)
+
+
+# with district effect
+def mdistrict(x1, x2, data, model = "m1", group_method = "a"):
+    return predict(modelSpec(model, group_method), np.concatenate([x1, x2]), data)
+
+
+def variant(x, approach, model):
+    """
+    Model layout and coefficient vector of the (approach, model) entry of x.
+    District-a/District-b hold only the district effects, on top of remove_facility.
+    """
+    if approach.startswith("District-"):
+        return modelSpec(model, approach[-1]), np.concatenate([x["remove_facility"][model], x[approach][model]])
+    if approach == "remove_facility":
+        return MODELS[model+"_v1"], x[approach][model]
+    return MODELS[model], x[approach][model]
+
+
+def allVariants(x):
+    return [(approach, model) for approach in x for model in x[approach]]
+
+
+def requiredColumns(x, variants = None):
+    """Data columns read by predictBatch for these variants"""
+    if variants is None:
+        variants = allVariants(x)
+    features = (feat for approach, model in variants for _, feat in variant(x, approach, model)[0])
+    return [feat for feat in dict.fromkeys(features) if feat != "const"] + ["AGE"]
+
+
+def predictBatch(x, data, variants = None, out = None):
+    """
+    Predicted SN of every (approach, model) variant from one shared feature matrix.
+    All coefficient vectors are stacked into one (n_features x 4*n_variants) matrix,
+    so each extra variant is a few more columns of the same matmul.
+    Returns the (n_rows x n_variants) prediction array (out if given) and the variant list.
+    """
+    if variants is None:
+        variants = allVariants(x)
+    specs = [splitDistricts(*variant(x, approach, model)) for approach, model in variants]
+    features = list(dict.fromkeys(feat for spec, _, _ in specs for _, feat in spec))
+    W = np.concatenate([coefMatrix(spec, coef, features) for spec, coef, _ in specs], axis = 1)
+    P = (featureMatrix(data, features) @ W).reshape(len(data), len(variants), len(TERMS))
+    codes = None
+    for i, (_, _, table) in enumerate(specs):
+        if table is not None:
+            codes = districtCodes(data) if codes is None else codes
+            P[:, i] += table[codes]
+    return curve(P, data["AGE"].to_numpy(dtype = np.float64)[:, None], out = out), variants
+
+
+def predictStore(x, data, observed = "SN_cummin", variants = None):
+    """
+    Observed and predicted SN of every variant in one (n_rows x 1+n_variants)
+    float64 array: column 0 is observed, col[(approach, model)] the predictions.
+    Plots take column views of it instead of adding columns to data.
+    """
+    if variants is None:
+        variants = allVariants(x)
+    SN = np.empty((len(data), 1+len(variants)), dtype = np.float64)
+    SN[:, 0] = data[observed].to_numpy(dtype = np.float64)
+    predictBatch(x, data, variants, out = SN[:, 1:])
+    SN.flags.writeable = False  # may be shared between sessions
+    return {"AGE": data["AGE"].to_numpy(dtype = np.float64),
+            "SN": SN,
+            "col": {"observed": 0, **{v: i+1 for i, v in enumerate(variants)}}}
@@ -0,0 +1,112 @@
+"""
+Per-stage timing of page reruns
+
+Pages wrap each hot-path stage (loading, selection, prediction, figure
+building) in `with stage(name) as s:` and may set s["rows"] and s["bytes"].
+Cached stages pass cached = True and count as cache hits unless the cached
+body calls miss(), which the figure cache and the cached page functions do
+when they compute. Records are kept per script thread, so concurrent
+sessions do not mix.
+
+finishRun() closes a rerun: it adds the records to process-wide totals per
+stage, logs them as one JSON line on the "friction.perf" logger (and appends
+it to FRIC_PERF_LOG when set), and returns them for the debug panel.
+"""
+import collections
+import contextlib
+import json
+import logging
+import os
+import threading
+import time
+
+
+PERF_LOG = os.environ.get("FRIC_PERF_LOG")
+
+log = logging.getLogger("friction.perf")
+
+_local = threading.local()
+_totals = collections.defaultdict(lambda: {"runs": 0, "seconds": 0.0, "max": 0.0, "hits": 0, "misses": 0})
+_lock = threading.Lock()
+
+
+def startRun(page):
+    """Start collecting the stages of a rerun of page"""
+    _local.page, _local.records, _local.open, _local.start = page, [], [], time.perf_counter()
+
+
+def _records():
+    if not hasattr(_local, "records"):
+        startRun(None)
+    return _local.records
+
+
+@contextlib.contextmanager
+def stage(name, cached = False, rows = None):
+    """Time the block as stage name; yields the record dict (rows, bytes, cache)"""
+    records = _records()
+    rec = {"stage": name, "seconds": None, "rows": rows, "bytes": None, "cache": "hit" if cached else None}
+    _local.open.append(rec)
+    start = time.perf_counter()
+    try:
+        yield rec
+    finally:
+        rec["seconds"] = time.perf_counter()-start
+        _local.open.remove(rec)
+        records.append(rec)
+
+
+def miss():
+    """Mark the innermost open cached stage as computed; call at the top of a cached body"""
+    for rec in reversed(getattr(_local, "open", [])):
+        if rec["cache"] is not None:
+            rec["cache"] = "miss"
+            return
+
+
+def payload(nbytes):
+    """Add nbytes to the payload of the innermost open stage"""
+    if getattr(_local, "open", None):
+        rec = _local.open[-1]
+        rec["bytes"] = (rec["bytes"] or 0)+nbytes
+
+
+def finishRun():
+    """Records of the current rerun; updates the totals and writes the structured log line"""
+    records = _records()
+    run = {"page": _local.page, "time": time.time(), "seconds": time.perf_counter()-_local.start, "stages": records}
+    with _lock:
+        for rec in records:
+            total = _totals[rec["stage"]]
+            total["runs"] += 1
+            total["seconds"] += rec["seconds"]
+            total["max"] = max(total["max"], rec["seconds"])
+            total["hits"] += rec["cache"] == "hit"
+            total["misses"] += rec["cache"] == "miss"
+    line = json.dumps(run, default = str)
+    log.info(line)
+    if PERF_LOG:
+        with _lock, open(PERF_LOG, "a") as f:
+            f.write(line+"\n")
+    startRun(_local.page)
+    return run
+
+
+def totals():
+    """Process-wide {stage: {runs, seconds, max, hits, misses}} since start"""
+    with _lock:
+        return {name: dict(total) for name, total in _totals.items()}
+
+
+def debugPanel(run):
+    """Sidebar table of the stages of run and the process totals, for the pages"""
+    import pandas as pd
+    import streamlit as st
+    with st.sidebar.expander("Performance", expanded = True):
+        st.write("This run: %.3f s" % run["seconds"])
+        st.dataframe(pd.DataFrame(run["stages"], columns = ["stage", "seconds", "rows", "bytes", "cache"]), hide_index = True)
+        st.write("Since process start")
+        frame = pd.DataFrame.from_dict(totals(), orient = "index")
+        if len(frame):
+            frame["mean"] = frame["seconds"]/frame["runs"]
+        st.dataframe(frame)
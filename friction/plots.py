@@ -0,0 +1,159 @@
+"""
+Plot helpers
+
+Box plots are drawn from precomputed statistics: quartiles, whiskers and a
+capped set of outliers per x group are computed in NumPy and sent as go.Box
+q1/median/q3/fence arrays, so the figure size grows with the number of x
+groups rather than the number of rows.
+
+Histograms and scatter plots are reduced the same way: np.histogram bars,
+and above max_points rows a 2-D binned density heatmap in place of the points.
+"""
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+
+
+def groupQuantile(values, starts, counts, q):
+    """Linear-interpolated quantile q of each sorted group values[start:start+count]"""
+    pos = starts+q*(counts-1)
+    lo = np.floor(pos).astype(np.intp)
+    hi = np.minimum(lo+1, starts+counts-1)
+    return values[lo]+(values[hi]-values[lo])*(pos-lo)
+
+
+def boxStats(x, y, max_outliers = 50):
+    """
+    Box statistics of y for each distinct x (numbers or category labels),
+    whiskers at 1.5 IQR like px.box.
+    Returns a dict of per-group arrays (x, q1, median, q3, lowerfence, upperfence)
+    and the outlier points (outlier_x, outlier_y), at most max_outliers of the
+    most extreme ones per group.
+    """
+    labels = None
+    if not pd.api.types.is_numeric_dtype(pd.Series(x).dtype):
+        codes, labels = pd.factorize(pd.Series(x), sort = True)  # category boxes, missing is -1
+        x = np.where(codes < 0, np.nan, codes)
+    x = np.asarray(x, dtype = np.float64)
+    y = np.asarray(y, dtype = np.float64)
+    keep = ~(np.isnan(x) | np.isnan(y))
+    x, y = x[keep], y[keep]
+    order = np.lexsort((y, x))
+    x, y = x[order], y[order]
+    groups, starts, counts = np.unique(x, return_index = True, return_counts = True)
+    if len(groups) == 0:
+        empty = np.empty(0)
+        return {"x": empty, "q1": empty, "median": empty, "q3": empty, "lowerfence": empty,
+                "upperfence": empty, "outlier_x": empty, "outlier_y": empty}
+    q1 = groupQuantile(y, starts, counts, 0.25)
+    median = groupQuantile(y, starts, counts, 0.5)
+    q3 = groupQuantile(y, starts, counts, 0.75)
+    g = np.repeat(np.arange(len(groups)), counts)
+    lo, hi = q1-1.5*(q3-q1), q3+1.5*(q3-q1)
+    inside = (y >= lo[g]) & (y <= hi[g])
+    lowerfence = np.minimum.reduceat(np.where(inside, y, np.inf), starts)
+    upperfence = np.maximum.reduceat(np.where(inside, y, -np.inf), starts)
+    # most extreme outliers first: distance beyond the box, ranked within each group
+    out = np.flatnonzero(~inside)
+    dist = np.maximum(lo[g[out]]-y[out], y[out]-hi[g[out]])
+    out = out[np.lexsort((-dist, g[out]))]
+    rank = np.arange(len(out))-np.searchsorted(g[out], g[out])
+    out = out[rank < max_outliers]
+    if labels is not None:
+        groups, x = np.asarray(labels)[groups.astype(np.intp)], np.asarray(labels)[x.astype(np.intp)]
+    return {"x": groups, "q1": q1, "median": median, "q3": q3,
+            "lowerfence": lowerfence, "upperfence": upperfence,
+            "outlier_x": x[out], "outlier_y": y[out]}
+
+
+def boxFigure(x, series, x_title = "AGE", y_title = "SN", legend_title = None, max_outliers = 50):
+    """
+    Grouped box plot of several series sharing x, drawn from boxStats.
+    series maps a legend name to its y values.
+    """
+    fig = go.Figure()
+    colors = px.colors.qualitative.Plotly
+    for i, (name, y) in enumerate(series.items()):
+        stats = boxStats(x, y, max_outliers = max_outliers)
+        color = colors[i % len(colors)]
+        fig.add_trace(go.Box(x = stats["x"], q1 = stats["q1"], median = stats["median"], q3 = stats["q3"],
+                             lowerfence = stats["lowerfence"], upperfence = stats["upperfence"],
+                             name = name, legendgroup = name, offsetgroup = name, marker_color = color,
+                             boxpoints = False))
+        fig.add_trace(go.Scatter(x = stats["outlier_x"], y = stats["outlier_y"], mode = "markers",
+                                 name = name, legendgroup = name, offsetgroup = name, showlegend = False,
+                                 marker = dict(color = color, size = 4)))
+    fig.update_layout(boxmode = "group", scattermode = "group", xaxis_title = x_title, yaxis_title = y_title,
+                      legend_title_text = legend_title, showlegend = len(series) > 1)
+    return fig
+
+
+def histogramFigure(values, x_title = None, start = None, log_y = False, max_bins = 200):
+    """Histogram drawn from np.histogram counts, values below start are left out like xbins start"""
+    values = np.asarray(values, dtype = np.float64)
+    values = values[~np.isnan(values)]
+    if start is not None:
+        values = values[values >= start]
+    if len(values) == 0:
+        counts, edges = np.zeros(0), np.zeros(1)
+    else:
+        span = (values.min() if start is None else start, values.max())
+        bins = min(len(np.histogram_bin_edges(values, bins = "auto", range = span))-1, max_bins)
+        counts, edges = np.histogram(values, bins = bins, range = span)
+    fig = go.Figure(go.Bar(x = (edges[:-1]+edges[1:])/2, y = counts, width = np.diff(edges),
+                           marker_line_width = 1, marker_line_color = "black"))
+    fig.update_layout(xaxis_title = x_title, yaxis_title = "count", bargap = 0)
+    if log_y:
+        fig.update_yaxes(type = "log")
+    return fig
+
+
+def scatterFigure(x, y, x_title = None, y_title = None, max_points = 5000, bins = 60):
+    """
+    Scatter plot of y against x. Up to max_points points are drawn with WebGL,
+    above that the points are binned into a bins x bins density heatmap.
+    """
+    x = np.asarray(x, dtype = np.float64)
+    y = np.asarray(y, dtype = np.float64)
+    keep = ~(np.isnan(x) | np.isnan(y))
+    x, y = x[keep], y[keep]
+    if len(x) <= max_points:
+        fig = go.Figure(go.Scattergl(x = x, y = y, mode = "markers"))
+    else:
+        counts, xedges, yedges = np.histogram2d(x, y, bins = bins)
+        fig = go.Figure(go.Heatmap(x = (xedges[:-1]+xedges[1:])/2, y = (yedges[:-1]+yedges[1:])/2,
+                                   z = np.where(counts > 0, counts, np.nan).T, colorscale = "Viridis",
+                                   colorbar_title = "count"))
+    fig.update_layout(xaxis_title = x_title, yaxis_title = y_title)
+    return fig
+
+
+def curveFigure(ages, curves, names, lower = None, upper = None, legend_title = None, y_range = (0, 80)):
+    """
+    SN vs. AGE line per name from the (n_lines x n_ages) curves, with a shaded
+    band between lower and upper when given
+    """
+    fig = go.Figure()
+    colors = px.colors.qualitative.Plotly
+    for i, name in enumerate(names):
+        color = colors[i % len(colors)]
+        if lower is not None:
+            fig.add_trace(go.Scatter(x = np.concatenate([ages, ages[::-1]]), y = np.concatenate([upper[i], lower[i][::-1]]),
+                                     fill = "toself", fillcolor = color, opacity = 0.2, line_width = 0,
+                                     legendgroup = str(name), showlegend = False, hoverinfo = "skip"))
+        fig.add_trace(go.Scatter(x = ages, y = curves[i], mode = "lines", name = str(name), legendgroup = str(name),
+                                 line_color = color))
+    fig.update_layout(xaxis_title = "AGE", yaxis_title = "SN", yaxis_range = list(y_range), legend_title_text = legend_title)
+    return fig
+
+
+def indexFigure(labels, values, names, y_title = None, legend_title = None, error = None):
+    """Grouped bars of the (n_names x n_labels) values, one bar group per label"""
+    fig = go.Figure()
+    colors = px.colors.qualitative.Plotly
+    for i, name in enumerate(names):
+        fig.add_trace(go.Bar(x = list(labels), y = values[i], name = str(name), marker_color = colors[i % len(colors)],
+                             error_y = None if error is None else dict(type = "data", array = error[i])))
+    fig.update_layout(barmode = "group", yaxis_title = y_title, legend_title_text = legend_title)
+    return fig
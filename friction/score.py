@@ -0,0 +1,139 @@
+"""
+Headless batch scoring
+
+Predicts SN for every row of fric under every (approach, model) entry of the
+coefficient registry and writes the predictions as Parquet, without a
+Streamlit session. Rows are read in fixed-size chunks, either slices of the
+memory-mapped snapshot file or a streamed database query, and scored on a
+process pool with a bounded number of chunks in flight, so memory stays
+bounded by the chunk size whatever the table size.
+
+    python -m friction.score --out fric_scores.parquet
+    python -m friction.score --table fric --secrets .streamlit/secrets.toml --out fric_scores.parquet
+"""
+import argparse
+import collections
+import concurrent.futures
+import os
+import tomllib
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import create_engine
+from sqlalchemy.engine import URL
+
+from friction.coefficients import coefficientSet
+from friction.data import snapshotPath
+from friction.models import allVariants, predictBatch, requiredColumns
+
+
+KEEP = ["DISTR", "CONT"]
+
+
+def scoreFrame(data, x, variants, keep):
+    """Kept columns of data followed by one prediction column approach_model per variant"""
+    SN, _ = predictBatch(x, data, variants)
+    out = data[keep].reset_index(drop = True)
+    for i, (approach, model) in enumerate(variants):
+        out[approach+"_"+model] = SN[:, i]
+    return pa.Table.from_pandas(out, preserve_index = False)
+
+
+def _scoreSlice(path, start, stop, columns, x, variants, keep):
+    with pa.memory_map(path) as source:
+        arrow = pa.ipc.open_file(source).read_all().select(columns).slice(start, stop-start)
+    return scoreFrame(arrow.to_pandas(), x, variants, keep)
+
+
+def snapshotChunks(path, columns, chunk):
+    """(path, start, stop) of each chunk of a snapshot file; workers map the file themselves"""
+    with pa.memory_map(path) as source:
+        arrow = pa.ipc.open_file(source).read_all()  # zero-copy, only the row count is used
+        names, n = arrow.schema.names, arrow.num_rows
+    missing = [col for col in columns if col not in names]
+    if missing:
+        raise ValueError("snapshot "+path+" has no column "+", ".join(missing))
+    return [(path, start, min(start+chunk, n)) for start in range(0, n, chunk)]
+
+
+def secretsUrl(path):
+    """SQLAlchemy url of the [connections.mysql] section of a Streamlit secrets file"""
+    with open(path, "rb") as f:
+        conf = tomllib.load(f)["connections"]["mysql"]
+    if "url" in conf:
+        return conf["url"]
+    dialect = conf.get("dialect", "mysql")
+    return URL.create(dialect+"+"+conf["driver"] if "driver" in conf else dialect, username = conf.get("username"),
+                      password = conf.get("password"), host = conf.get("host"), port = conf.get("port"),
+                      database = conf.get("database"), query = conf.get("query", {}))
+
+
+def queryChunks(url, table, columns, chunk):
+    """DataFrame chunks of the columns of table, streamed from the database"""
+    engine = create_engine(url)
+    with engine.connect().execution_options(stream_results = True) as conn:
+        sql = "SELECT "+", ".join("`"+col+"`" for col in columns)+" from "+table
+        yield from pd.read_sql(sql, conn, chunksize = chunk)
+
+
+def scoreTable(out, chunks, task, x, variants, keep, workers = None):
+    """
+    Score every chunk with task(chunk..., x, variants, keep) and write the
+    tables to out in chunk order. Returns the number of rows written.
+    """
+    workers = workers or os.cpu_count()
+    writer, rows = None, 0
+    with concurrent.futures.ProcessPoolExecutor(max_workers = workers) as pool:
+        pending = collections.deque()
+        chunks = iter(chunks)
+        while True:
+            while len(pending) < 2*workers:
+                args = next(chunks, None)
+                if args is None:
+                    break
+                pending.append(pool.submit(task, *args, x, variants, keep))
+            if not pending:
+                break
+            table = pending.popleft().result()
+            if writer is None:
+                writer = pq.ParquetWriter(out, table.schema)
+            writer.write_table(table.cast(writer.schema))
+            rows += table.num_rows
+    if writer is not None:
+        writer.close()
+    return rows
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(prog = "python -m friction.score", description = "Score fric under every model variant")
+    parser.add_argument("--out", required = True, help = "Parquet file to write")
+    parser.add_argument("--snapshot", help = "snapshot file to read (default: the fric snapshot)")
+    parser.add_argument("--table", help = "query this table from the database instead of a snapshot")
+    parser.add_argument("--url", help = "SQLAlchemy url of the database")
+    parser.add_argument("--secrets", default = os.path.join(".streamlit", "secrets.toml"),
+                        help = "Streamlit secrets file with the [connections.mysql] section, when no --url is given")
+    parser.add_argument("--chunk", type = int, default = 200000, help = "rows per chunk")
+    parser.add_argument("--workers", type = int, default = None, help = "scoring processes (default: all cores)")
+    parser.add_argument("--version", type = int, default = None, help = "coefficient version (default: newest)")
+    parser.add_argument("--keep", nargs = "*", default = KEEP, help = "columns copied to the output")
+    args = parser.parse_args(argv)
+
+    x = coefficientSet(args.version)
+    variants = allVariants(x)
+    keep = list(args.keep)
+    columns = list(dict.fromkeys(keep+requiredColumns(x, variants)))
+    if args.table is not None:
+        url = args.url or secretsUrl(args.secrets)
+        chunks = ((frame,) for frame in queryChunks(url, args.table, columns, args.chunk))
+        task = scoreFrame
+    else:
+        path = args.snapshot or snapshotPath("fric")
+        chunks = [(path, start, stop, columns) for path, start, stop in snapshotChunks(path, columns, args.chunk)]
+        task = _scoreSlice
+    rows = scoreTable(args.out, chunks, task, x, variants, keep, workers = args.workers)
+    print("scored %d rows under %d variants into %s" % (rows, len(variants), args.out))
+
+
+if __name__ == "__main__":
+    main()
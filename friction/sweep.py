@@ -0,0 +1,111 @@
+"""
+Sensitivity sweeps over the model inputs
+
+A sweep design is a set of input combinations (curves) built directly as a
+feature matrix: one-at-a-time designs vary each variable over its levels
+around the baseline, full-factorial designs take every combination of levels.
+Categorical variables (PAV_TYPE, HIGHWAY_FUN) map each level to its indicator
+features. All curves are evaluated over the AGE grid in one batch.
+"""
+import numpy as np
+
+from friction.models import coefMatrix, curve, specFeatures
+
+
+# indicator features set by each level of the categorical variables
+CATEGORIES = {"PAV_TYPE": {"AC_Thin": [], "AC_Thick": ["AC_Thick"], "COM": ["COM"], "JCP": ["JCP"], "CRCP": ["CRCP"]},
+              "HIGHWAY_FUN": {"FM": [], "SH": ["SH"], "US": ["US"], "IH": ["IH"]}}
+
+VARIABLES = ["PAV_TYPE", "HIGHWAY_FUN", "AADT", "TRUCK_PCT", "tavg", "prcp"]
+
+BASELINE = {"PAV_TYPE": "AC_Thick", "HIGHWAY_FUN": "FM", "AADT": 5000, "TRUCK_PCT": 15, "tavg": 67, "prcp": 35}
+
+LEVELS = {"PAV_TYPE": ["AC_Thin", "AC_Thick", "COM", "JCP", "CRCP"],
+          "HIGHWAY_FUN": ["FM", "SH", "US", "IH"],
+          "AADT": [2000, 5000, 15000],
+          "TRUCK_PCT": [10, 15, 25],
+          "tavg": [56, 67, 72],
+          "prcp": [33, 35, 45]}
+
+FEATURES = ["const", "SH", "US", "IH", "AC_Thick", "COM", "JCP", "CRCP", "tavg", "prcp", "TRUCK_PCT", "AADT"]
+
+
+def levelColumns(variable, levels):
+    """(n_levels x n_features) feature values set by each level of a variable"""
+    cols = np.zeros((len(levels), len(FEATURES)), dtype = np.float64)
+    for i, level in enumerate(levels):
+        if variable in CATEGORIES:
+            for feat in CATEGORIES[variable][level]:
+                cols[i, FEATURES.index(feat)] = 1.0
+        else:
+            cols[i, FEATURES.index(variable)] = level
+    return cols
+
+
+def featureRows(choice, levels):
+    """Feature matrix of the curves given the level index of every variable per curve"""
+    X = np.zeros((len(next(iter(choice.values()))), len(FEATURES)), dtype = np.float64)
+    X[:, FEATURES.index("const")] = 1.0
+    for variable, idx in choice.items():
+        X += levelColumns(variable, levels[variable])[idx]
+    return X
+
+
+def design(levels = None, baseline = None, mode = "oat"):
+    """
+    Sweep design over levels (dict of variable -> level list, defaults to LEVELS).
+    mode "oat": each variable over its levels, the others at baseline; "factorial":
+    every combination of levels. Returns the (n_curves x n_features) matrix X,
+    the level index of each variable per curve, and for oat the varied variable.
+    """
+    levels = {**LEVELS, **(levels or {})}
+    baseline = {**BASELINE, **(baseline or {})}
+    variables = [v for v in VARIABLES if v in levels]
+    if mode == "oat":
+        base = {}
+        for v in variables:
+            values = list(levels[v])
+            if baseline[v] not in values:
+                values.append(baseline[v])  # keep the baseline reachable
+                levels[v] = values
+            base[v] = values.index(baseline[v])
+        n = sum(len(levels[v]) for v in variables)
+        choice = {v: np.full(n, base[v], dtype = np.intp) for v in variables}
+        varied = np.empty(n, dtype = object)
+        start = 0
+        for v in variables:
+            k = len(levels[v])
+            choice[v][start:start+k] = np.arange(k)
+            varied[start:start+k] = v
+            start += k
+    elif mode == "factorial":
+        grid = np.indices([len(levels[v]) for v in variables]).reshape(len(variables), -1)
+        choice = {v: grid[i] for i, v in enumerate(variables)}
+        varied = None
+    else:
+        raise ValueError("unknown sweep mode "+repr(mode))
+    return {"X": featureRows(choice, levels), "choice": choice, "levels": levels, "varied": varied}
+
+
+def sweepCurves(spec, x, sweep, ages):
+    """SN of every curve of a sweep design at every age, (n_curves x n_ages)"""
+    missing = [feat for feat in specFeatures(spec) if feat not in FEATURES]
+    if missing:
+        raise ValueError("sweep does not set model features "+", ".join(missing))
+    P = sweep["X"] @ coefMatrix(spec, x, FEATURES)
+    return curve(P[:, None, :], np.asarray(ages, dtype = np.float64)[None, :])
+
+
+def levelSummary(sweep, curves, variable, q = (0.1, 0.5, 0.9)):
+    """
+    Quantiles of SN at each age over all curves sharing each level of variable,
+    (n_levels x len(q) x n_ages). For oat designs only the curves varying it are used.
+    """
+    idx = sweep["choice"][variable]
+    rows = np.arange(len(idx)) if sweep["varied"] is None else np.flatnonzero(sweep["varied"] == variable)
+    out = np.full((len(sweep["levels"][variable]), len(q), curves.shape[1]), np.nan)
+    for k in range(len(sweep["levels"][variable])):
+        sel = rows[idx[rows] == k]
+        if len(sel):
+            out[k] = np.quantile(curves[sel], q, axis = 0)
+    return out
@@ -0,0 +1,95 @@
+"""
+Synthetic tables with the schema of the database tables
+
+fric (one row per segment survey), est_per_proj (fitted curve parameters per
+project) and tx_county_district (county to district lookup), filled with
+random values in realistic ranges, for benchmarks and offline checks. Rows
+are generated in the compact dtypes the snapshots use (categoricals, int8
+indicators, float32 measurements), so 10M-row tables fit in memory. Fitted
+curve parameters stay float64 like the database values.
+"""
+import numpy as np
+import pandas as pd
+
+from friction.geo import loadCounties
+from friction.models import DISTRICT_NAMES as DUMMY_NAMES, DISTRICTS, m2
+
+
+# TxDOT districts by number, DISTR is the number
+DISTRICT_NAMES = ["Paris", "Fort Worth", "Wichita Falls", "Amarillo", "Lubbock", "Odessa", "San Angelo", "Abilene",
+                  "Waco", "Tyler", "Lufkin", "Houston", "Yoakum", "Austin", "San Antonio", "Corpus Christi", "Bryan",
+                  "Dallas", "Atlanta", "Beaumont", "Pharr", "Laredo", "Brownwood", "El Paso", "Childress"]
+
+# district number of each district dummy column
+DUMMY_DISTR = {dummy: DISTRICT_NAMES.index(name)+1 for dummy, name in DUMMY_NAMES.items()}
+
+HIGHWAY_FUN = ["FM", "SH", "US", "IH"]
+PAV_TYPE = ["AC_Thin", "AC_Thick", "AC_Com", "JCP", "CRCP"]
+
+# one-hot model column of each PAV_TYPE label, AC_Thin is the base level
+PAV_COLUMNS = {"AC_Thick": "AC_Thick", "AC_Com": "COM", "JCP": "JCP", "CRCP": "CRCP"}
+
+
+def synthCounties():
+    """tx_county_district: the 254 counties of the bundled boundaries, spread over the districts"""
+    features = loadCounties()["features"]
+    fips = np.array([int(f["id"]) for f in features], dtype = np.int32)
+    distr = np.arange(len(fips)) % len(DISTRICT_NAMES)+1
+    return pd.DataFrame({"County_FIPS_Code": fips,
+                         "County_Name": pd.Categorical([f["properties"]["NAME"] for f in features]),
+                         "DISTR": distr.astype(np.int8),
+                         "District_Name": pd.Categorical(np.array(DISTRICT_NAMES)[distr-1], categories = DISTRICT_NAMES)})
+
+
+def commonColumns(rng, n):
+    """Columns shared by fric and est_per_proj: district, facility, pavement, traffic, climate"""
+    distr = rng.integers(1, len(DISTRICT_NAMES)+1, n).astype(np.int8)
+    return {"DISTR": distr,
+            "HIGHWAY_FUN": pd.Categorical.from_codes(rng.choice(len(HIGHWAY_FUN), n, p = [0.45, 0.25, 0.2, 0.1]), HIGHWAY_FUN),
+            "PAV_TYPE": pd.Categorical.from_codes(rng.choice(len(PAV_TYPE), n, p = [0.3, 0.35, 0.15, 0.1, 0.1]), PAV_TYPE),
+            "AADT": rng.lognormal(8.5, 1.0, n).round().astype(np.float32),
+            "TRUCK_PCT": rng.uniform(5, 35, n).astype(np.float32),
+            "tavg": rng.uniform(55, 73, n).astype(np.float32),
+            "prcp": rng.uniform(10, 60, n).astype(np.float32)}
+
+
+def synthFric(n, seed = 0, x = None):
+    """
+    fric with n rows. With a coefficient set x, SN_cummin follows the
+    stepwise m2 model plus noise, otherwise a generic decay curve.
+    """
+    rng = np.random.default_rng(seed)
+    data = pd.DataFrame(commonColumns(rng, n))
+    data["CONT"] = rng.integers(1, 10000, n).astype(np.int16)
+    for level in HIGHWAY_FUN[1:]:
+        data[level] = (data["HIGHWAY_FUN"] == level).to_numpy(dtype = np.int8)
+    for level, column in PAV_COLUMNS.items():
+        data[column] = (data["PAV_TYPE"] == level).to_numpy(dtype = np.int8)
+    for dummy in DISTRICTS:
+        data[dummy] = (data["DISTR"] == DUMMY_DISTR[dummy]).to_numpy(dtype = np.int8)
+    data["AGE"] = rng.uniform(0, 20, n).round(1).astype(np.float32)
+    if x is None:
+        sn = 25+20*np.exp(-0.15*data["AGE"].to_numpy(dtype = np.float64))
+    else:
+        sn = m2(x["stepwise"]["m2"], data)
+    data["SN_cummin"] = (sn+rng.normal(0, 3, n)).astype(np.float32)
+    return data
+
+
+def synthProjects(n, seed = 0, counties = None):
+    """est_per_proj with n projects, curve parameters a/b/c/t0 per model and a county each"""
+    rng = np.random.default_rng(seed)
+    counties = synthCounties() if counties is None else counties
+    data = pd.DataFrame(commonColumns(rng, n))
+    pick = rng.integers(0, len(counties), n)
+    data["County_FIPS_Code"] = counties["County_FIPS_Code"].to_numpy()[pick]
+    data["District_Name"] = pd.Categorical(counties["District_Name"].to_numpy()[pick], categories = DISTRICT_NAMES)
+    data["PAV_TYPE"] = data["PAV_TYPE"].cat.add_categories(["other"])
+    data.loc[rng.random(n) < 0.05, "PAV_TYPE"] = "other"
+    for model in ("m1", "m2"):
+        missing = rng.random(n) < 0.1
+        params = {"a": rng.normal(30, 8, n), "b": rng.lognormal(2.5, 0.6, n),
+                  "c": rng.lognormal(-2, 0.8, n), "t0": rng.normal(0, 1.5, n)}
+        for para, values in params.items():
+            data[para+"_"+model] = np.where(missing, np.nan, values)  # float64, as the database returns them
+    return data
@@ -0,0 +1,102 @@
+"""
+Age at which SN drops below an intervention threshold
+
+Inverting SN = a + b*exp(-c*(AGE-t0)) at SN = T gives
+
+    AGE = t0 - ln((T-a)/b)/c
+
+for every segment at once from its (a, b, c, t0) terms. The curve only drops
+through T when it decreases (b*c > 0) and the log argument (T-a)/b is
+positive: with b, c > 0 it levels off at a, so T must be above a; with b, c < 0
+it falls without bound and always gets there. Otherwise a segment above T
+never reaches it (inf). Segments already at or
+below T at AGE 0 get 0. Curves with |c| below eps (or b = 0) are treated as
+constant: 0 if they start at or below T, inf otherwise.
+
+Segments need not carry the one-hot and district dummy columns: the facility,
+pavement and district indicators are derived from the HIGHWAY_FUN, PAV_TYPE
+and District_Name labels when the columns are missing (est_per_proj).
+"""
+import numpy as np
+import pandas as pd
+
+from friction.models import (DISTRICT_NAMES, DISTRICTS, coefMatrix, curve, districtCodes, specFeatures,
+                             splitDistricts, variant)
+
+
+# indicator feature of each HIGHWAY_FUN/PAV_TYPE label, labels not listed set none
+LABELS = {"HIGHWAY_FUN": {"SH": "SH", "US": "US", "IH": "IH"},
+          "PAV_TYPE": {"AC_Thick": "AC_Thick", "COM": "COM", "AC_Com": "COM", "JCP": "JCP", "CRCP": "CRCP"}}
+
+
+def thresholdAge(P, threshold, eps = 1e-9):
+    """Age at which SN of the (n x 4) terms P first drops to threshold, inf if never, NaN if unknown"""
+    a, b, c, t0 = np.asarray(P, dtype = np.float64).T
+    with np.errstate(divide = "ignore", invalid = "ignore", over = "ignore"):
+        start = curve(np.asarray(P, dtype = np.float64), 0.0)
+        age = t0-np.log((threshold-a)/b)/c
+        crosses = (b*c > 0) & ((threshold-a)/b > 0) & (np.abs(c) >= eps)
+    age = np.where(crosses, np.maximum(age, 0.0), np.inf)
+    age[start <= threshold] = 0.0
+    age[np.isnan(P).any(axis = 1)] = np.nan
+    return age
+
+
+def segmentFeatures(data, features):
+    """Feature matrix of the segments, indicators from the label columns where the column is missing"""
+    X = np.empty((len(data), len(features)), dtype = np.float64)
+    for j, feat in enumerate(features):
+        if feat == "const":
+            X[:, j] = 1.0
+        elif feat in data:
+            X[:, j] = data[feat].to_numpy(dtype = np.float64)
+        else:
+            label = next(col for col, levels in LABELS.items() if feat in levels.values())
+            labels = pd.Categorical(data[label])
+            hit = [LABELS[label].get(str(level)) == feat for level in labels.categories]
+            X[:, j] = np.append(hit, False)[labels.codes]  # code -1 (missing) picks the trailing False
+    return X
+
+
+def segmentDistricts(data):
+    """District code of each segment (see models.districtCodes), from the dummies or District_Name"""
+    if all(dist in data for dist in DISTRICTS):
+        return districtCodes(data)
+    codes = pd.Categorical(data["District_Name"], categories = [DISTRICT_NAMES[dist] for dist in DISTRICTS]).codes
+    return np.where(codes < 0, len(DISTRICTS), codes).astype(np.intp)
+
+
+def thresholdAges(x, approach, model, data, threshold):
+    """Age at which each segment of data drops to threshold under the (approach, model) entry of x"""
+    spec, coef, table = splitDistricts(*variant(x, approach, model))
+    features = specFeatures(spec)
+    P = segmentFeatures(data, features) @ coefMatrix(spec, coef, features)
+    if table is not None:
+        P += table[segmentDistricts(data)]
+    return thresholdAge(P, threshold)
+
+
+def rollup(ages, keys, by):
+    """
+    Per value of by: number of segments, number reaching the threshold, share
+    never reaching it and the median and 10% quantile age of those that do
+    """
+    frame = pd.DataFrame({by: np.asarray(keys), "age": ages}).dropna(subset = ["age"])
+    frame["crossing"] = np.isfinite(frame["age"])
+    groups = frame.groupby(by, observed = True, sort = False)
+    crossing = frame.loc[frame["crossing"]].groupby(by, observed = True, sort = False)["age"]
+    out = pd.DataFrame({"segments": groups.size(), "crossing": groups["crossing"].sum()})
+    out["never_share"] = 1-out["crossing"]/out["segments"]
+    out["median_age"] = crossing.median()
+    out["q10_age"] = crossing.quantile(0.1)
+    return out.reset_index()
+
+
+def countyRollup(ages, data, counties, by = "County_FIPS_Code"):
+    """rollup per county, on the rows of tx_county_district (counties without segments get NaN)"""
+    return counties.merge(rollup(ages, data[by].to_numpy(), by), on = by, how = "left")
+
+
+def districtRollup(ages, data, by = "District_Name"):
+    """rollup per district"""
+    return rollup(ages, data[by].to_numpy(), by).sort_values(by).reset_index(drop = True)
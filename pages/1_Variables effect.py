@@ -8,6 +8,15 @@ import plotly.graph_objects as go
 from urllib.request import urlopen
 import json
 
+from friction.coefficients import coefficientSet
+from friction.data import datasetData, ensureSnapshot, refreshTables
+from friction.figcache import cachedFigure, clearFigures, figureKey
+from friction.geo import loadCounties
+from friction.perf import debugPanel, finishRun, miss, stage, startRun
+from friction.pivot import thresholdCounts, thresholdIndex
+from friction.plots import boxFigure, histogramFigure, scatterFigure
+from friction.threshold import countyRollup, districtRollup, thresholdAges
+
 st.set_page_config(layout="wide", 
                    page_title='Variabele effect', 
                    menu_items={
@@ -52,37 +61,44 @@ def check_password():
         # Password correct.
         return True
 
-@st.cache_data
+# Dataset handles (table + snapshot version), cheap cache keys for the functions below
 def dataLoad(_conn):
     """
     mode1: select for each segment
     mode2: select for multiple segment
     creating 2d array of the height measurement
     """
-    data = conn.query('SELECT * from est_per_proj;') 
-    data.replace("#NAME?", np.nan, inplace = True)
-    txCounty = conn.query('SELECT * from tx_county_district;') 
+    data = ensureSnapshot(conn, "est_per_proj", na_values = "#NAME?")
+    txCounty = ensureSnapshot(conn, "tx_county_district")
     return data, txCounty
 
 
-# Filter data for different model
-@st.cache_data
-def dataFilter(data, model):
+# Filter data for different model, shared read-only by every session
+@st.cache_resource
+def dataFilter(dataset, model):
+    miss()
+    data = datasetData(dataset)
     model_data = data.loc[(data["a_"+model].notna())&(data["a_"+model].notna())&(data["PAV_TYPE"]!="other")].reset_index(drop = True)
     return model_data
 
 
-# Pivot information based on the threshold
-@st.cache_data
-def dataPivot(data, threshold, para, model):
-    data = data.copy()
-    data["compare"] = data[para+"_"+model]>=threshold #compare with the threshold
-    pivot_sum = data.groupby(by = ['District_Number', 'District_Name', 'District_Abbr', 'County_Number', 'County_FIPS_Code', 'County_Name', "compare"]).size().reset_index(name = "count") #pivot information based on the threshold    
-    return pivot_sum
+# Sorted parameter values per county, for above/below counts at any threshold
+@st.cache_resource
+def dataThreshold(dataset, para, model, countyset):
+    miss()
+    return thresholdIndex(dataFilter(dataset, model), para+"_"+model, datasetData(countyset)["County_FIPS_Code"])
+
+
+# Age at which each project drops to an intervention SN, rolled up to counties and districts
+@st.cache_resource(max_entries = 16)
+def thresholdMap(dataset, countyset, threshold, approach, model):
+    miss()
+    data = dataFilter(dataset, model)
+    ages = thresholdAges(coefficientSet(), approach, model, data, threshold)
+    return countyRollup(ages, data, datasetData(countyset)), districtRollup(ages, data)
 
 
-@st.cache_data
-def distPlot(data, para, model):
+def distPlot(dataset, para, model, max_points = 5000):
     """
         histogram
         DISTRICT
@@ -93,45 +109,68 @@ def distPlot(data, para, model):
         tavg
         prcp
     """
-    fig1 = px.histogram(data, x=para+"_"+model, log_y = True).update_layout(xaxis_title = para)
-    fig1.update_traces(marker_line_width=1,marker_line_color="black", xbins=dict(start=0.0))
-    fig2 = px.box(data, x = "District_Name", y=para+"_"+model).update_layout(yaxis_title = para)
-    fig3 = px.box(data, x = "HIGHWAY_FUN", y=para+"_"+model).update_layout(yaxis_title = para)
-    fig4 = px.box(data, x = "PAV_TYPE", y=para+"_"+model).update_layout(yaxis_title = para)
-
-    fig5 = px.scatter(data, x="AADT", y=para+"_"+model).update_layout(yaxis_title = para)
-    fig6 = px.scatter(data, x="TRUCK_PCT", y=para+"_"+model).update_layout(yaxis_title = para)
-    fig7 = px.scatter(data, x="tavg", y=para+"_"+model).update_layout(yaxis_title = para)
-    fig8 = px.scatter(data, x="prcp",y=para+"_"+model).update_layout(yaxis_title = para)
+    with stage("dataFilter", cached = True) as s:
+        data = dataFilter(dataset, model)
+        s["rows"] = len(data)
+    y = data[para+"_"+model]
+    key = lambda name: figureKey("Variables effect", dataset, model, para, name, max_points)
+
+    def figure(name, build):
+        with stage("figure "+name, cached = True, rows = len(data)):
+            return cachedFigure(key(name), build)
+
+    fig1 = figure("histogram", lambda: histogramFigure(y, x_title = para, start = 0.0, log_y = True))
+    fig2 = figure("District_Name", lambda: boxFigure(data["District_Name"], {para: y}, x_title = "District_Name", y_title = para))
+    fig3 = figure("HIGHWAY_FUN", lambda: boxFigure(data["HIGHWAY_FUN"], {para: y}, x_title = "HIGHWAY_FUN", y_title = para))
+    fig4 = figure("PAV_TYPE", lambda: boxFigure(data["PAV_TYPE"], {para: y}, x_title = "PAV_TYPE", y_title = para))
+
+    # WebGL points up to max_points projects, binned density above
+    fig5 = figure("AADT", lambda: scatterFigure(data["AADT"], y, x_title = "AADT", y_title = para, max_points = max_points))
+    fig6 = figure("TRUCK_PCT", lambda: scatterFigure(data["TRUCK_PCT"], y, x_title = "TRUCK_PCT", y_title = para, max_points = max_points))
+    fig7 = figure("tavg", lambda: scatterFigure(data["tavg"], y, x_title = "tavg", y_title = para, max_points = max_points))
+    fig8 = figure("prcp", lambda: scatterFigure(data["prcp"], y, x_title = "prcp", y_title = para, max_points = max_points))
  
-    col1, col2 = st.columns(2)
-    with col1:
-        with st.container():
-            st.plotly_chart(fig1,use_container_width=True)
-            st.plotly_chart(fig2,use_container_width=True)
-            st.plotly_chart(fig3,use_container_width=True)
-            st.plotly_chart(fig4,use_container_width=True)
-    with col2:
-        with st.container():
-            st.plotly_chart(fig5,use_container_width=True)
-            st.plotly_chart(fig6,use_container_width=True)
-            st.plotly_chart(fig7,use_container_width=True)
-            st.plotly_chart(fig8,use_container_width=True)
+    with stage("plotly_chart"): # serialization to the browser
+        col1, col2 = st.columns(2)
+        with col1:
+            with st.container():
+                st.plotly_chart(fig1,use_container_width=True)
+                st.plotly_chart(fig2,use_container_width=True)
+                st.plotly_chart(fig3,use_container_width=True)
+                st.plotly_chart(fig4,use_container_width=True)
+        with col2:
+            with st.container():
+                st.plotly_chart(fig5,use_container_width=True)
+                st.plotly_chart(fig6,use_container_width=True)
+                st.plotly_chart(fig7,use_container_width=True)
+                st.plotly_chart(fig8,use_container_width=True)
 
 try:
     if st.session_state["allow"]:
+        startRun("Variables effect")
         # MySQL connection and load data
         conn = st.connection("mysql", type="sql")
-        data, txCounty = dataLoad(_conn=conn)
+        with st.sidebar:
+            if st.button("Refresh data"): # pull new project rows into the local snapshots
+                if any(refreshTables(conn, ["est_per_proj", "tx_county_district"], st.secrets.get("refresh", {}), na_values = "#NAME?").values()): # only when a snapshot changed
+                    clearFigures()
+        with stage("dataLoad") as s:
+            dataset, countyset = dataLoad(_conn=conn)
+            txCounty = datasetData(countyset)
+            s["rows"] = len(txCounty)
 
-        with urlopen('https://raw.githubusercontent.com/plotly/datasets/master/geojson-counties-fips.json') as response:
-            counties = json.load(response)
+        with stage("loadCounties"):
+            counties = loadCounties() # Texas county boundaries, shared by both maps
 
         with st.sidebar:
             modelOpt = st.selectbox("select model:",('m1', 'm2'))
             paraOpt = st.selectbox("select parameter:", ("a", "b", "c", "t0"))
-            data_temp = dataFilter(data, model = modelOpt) # Select data for selected model
-            varthreshold = st.slider("threshold:",  min_value=data_temp[paraOpt+"_"+modelOpt].min(), max_value=data_temp[paraOpt+"_"+modelOpt].max(), value=data_temp[paraOpt+"_"+modelOpt].min())
+            with stage("dataFilter", cached = True) as s:
+                data_temp = dataFilter(dataset, model = modelOpt) # Select data for selected model
+                s["rows"] = len(data_temp)
+            # float(): snapshot parameter columns may be float32, which st.slider rejects
+            paraMin, paraMax = float(data_temp[paraOpt+"_"+modelOpt].min()), float(data_temp[paraOpt+"_"+modelOpt].max())
+            varthreshold = st.slider("threshold:",  min_value=paraMin, max_value=paraMax, value=paraMin)
 
 
         col1, col2 = st.columns([3,2], gap = "medium")
@@ -140,34 +179,78 @@ try:
                 st.subheader("Effect of variables")
 
                 col11, col12 = st.columns(2)
-                distPlot(data= data_temp, para = paraOpt, model = modelOpt) # plot distribution and effect of variables
+                distPlot(dataset, para = paraOpt, model = modelOpt) # plot distribution and effect of variables
 
         with col2:
             with st.container():
                 st.subheader("Geo Distribution")
 
-                # pivot information based on the threshold       
-                pivot_info = dataPivot(data = data_temp, threshold = varthreshold, para = paraOpt, model = modelOpt)
-                datAbove = txCounty.merge(pivot_info.loc[pivot_info["compare"], ["County_FIPS_Code", "compare", "count"]], how = "left", on = "County_FIPS_Code").replace(np.nan,0)
-                dataBelow = txCounty.merge(pivot_info.loc[~pivot_info["compare"], ["County_FIPS_Code", "compare", "count"]], how = "left", on = "County_FIPS_Code").replace(np.nan,0)
+                # project counts per county above/below the threshold
+                with stage("dataThreshold", cached = True):
+                    index = dataThreshold(dataset, para = paraOpt, model = modelOpt, countyset = countyset)
+                with stage("thresholdCounts", rows = len(txCounty)):
+                    above, below = thresholdCounts(index, varthreshold)
+                datAbove = txCounty.assign(count = above)
+                dataBelow = txCounty.assign(count = below)
+
+                def countMap(counts):
+                    fig = px.choropleth(counts, geojson=counties, locations='County_FIPS_Code', color='count',
+                                    color_continuous_scale="Viridis",
+                                    scope="usa",
+                                    range_color=(0, counts["count"].max()),
+                                    hover_data = ["District_Name", "County_Name", "count"])
+                    fig.update_geos(fitbounds="locations")
+                    return fig
 
                 st.write("Number of project with "+ paraOpt + " above threshold")
-                fig = px.choropleth(datAbove, geojson=counties, locations='County_FIPS_Code', color='count',
-                                color_continuous_scale="Viridis",
-                                scope="usa",
-                                range_color=(0, datAbove["count"].max()),
-                                hover_data = ["District_Name", "County_Name", "count"])
-                fig.update_geos(fitbounds="locations")
-                st.plotly_chart(fig,use_container_width=True)
+                with stage("figure county counts above", cached = True):
+                    fig = cachedFigure(figureKey("Variables effect", "county counts", above), lambda: countMap(datAbove))
+                with stage("plotly_chart"):
+                    st.plotly_chart(fig,use_container_width=True)
 
                 st.write("Number of project with "+ paraOpt + " below threshold")
-                fig = px.choropleth(dataBelow, geojson=counties, locations='County_FIPS_Code', color='count',
-                                color_continuous_scale="Viridis",
-                                scope="usa",
-                                range_color=(0, dataBelow["count"].max()),
-                                hover_data = ["District_Name", "County_Name", "count"])
-                fig.update_geos(fitbounds="locations")
+                with stage("figure county counts below", cached = True):
+                    fig = cachedFigure(figureKey("Variables effect", "county counts", below), lambda: countMap(dataBelow))
+                with stage("plotly_chart"):
+                    st.plotly_chart(fig,use_container_width=True)
+
+        st.subheader("Time to threshold")
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            snThreshold = st.slider("intervention SN:", min_value = 10.0, max_value = 60.0, value = 30.0, step = 0.5)
+        with col2:
+            approachOpt = st.selectbox("select approach:", list(coefficientSet()))
+        with col3:
+            ageModelOpt = st.selectbox("select model:", ("m1", "m2"), key = "ageModel")
+        with stage("thresholdMap", cached = True):
+            countyAges, districtAges = thresholdMap(dataset, countyset, snThreshold, approachOpt, ageModelOpt)
+
+        def ageMap(ages):
+            fig = px.choropleth(ages, geojson=counties, locations='County_FIPS_Code', color='median_age',
+                            color_continuous_scale="Viridis_r",
+                            scope="usa",
+                            hover_data = ["District_Name", "County_Name", "segments", "crossing", "never_share", "median_age"])
+            fig.update_geos(fitbounds="locations")
+            fig.update_layout(coloraxis_colorbar_title = "median age")
+            return fig
+
+        col1, col2 = st.columns([3,2], gap = "medium")
+        with col1:
+            st.write("Median age at which projects drop to SN "+str(snThreshold))
+            with stage("figure time to threshold", cached = True):
+                fig = cachedFigure(figureKey("Variables effect", "time to threshold", dataset, countyset, snThreshold, approachOpt, ageModelOpt),
+                                   lambda: ageMap(countyAges))
+            with stage("plotly_chart"):
                 st.plotly_chart(fig,use_container_width=True)
+        with col2:
+            st.write("By district")
+            with stage("dataframe"): # serialization of the district table
+                st.dataframe(districtAges, hide_index = True, use_container_width = True)
+
+        run = finishRun()
+        with st.sidebar:
+            if st.checkbox("Performance panel"): # per-stage timings of this rerun
+                debugPanel(run)
     else:
         st.write("Login to view the app")
         st.session_state["allow"] = check_password()
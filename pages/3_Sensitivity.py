@@ -10,6 +10,15 @@ import json
 import seaborn as sns
 import matplotlib.pyplot as plt
 
+from friction.coefficients import coefficientSet
+from friction.data import loadTable
+from friction.figcache import cachedFigure, figureKey
+from friction.gsa import morrisEffects, sobolIndices
+from friction.models import variant
+from friction.perf import debugPanel, finishRun, miss, stage, startRun
+from friction.plots import curveFigure, indexFigure
+from friction.sweep import LEVELS, VARIABLES, design, levelSummary, sweepCurves
+
 st.set_page_config(layout="wide", 
                    page_title='Sensitivity', 
                    menu_items={
@@ -61,195 +70,151 @@ def dataLoad(_conn):
     mode2: select for multiple segment
     creating 2d array of the height measurement
     """
-    data = conn.query('SELECT * from fricPAwh;') 
-    distr_cont = conn.query('SELECT * from distr_cont_onlineApp;') 
+    data = loadTable(conn, "fricPAwh")
+    distr_cont = loadTable(conn, "distr_cont_onlineApp")
     return data, distr_cont
 
 
-# Performance model I
-def m1(x,data):
-    a = x[0] + x[1]*data["SH"] + x[2]*data["US"]+x[3]*data["IH"]
-    b = x[4] + x[5]*data["AC_Thick"]+x[6]*data["COM"]+x[7]*data["JCP"]+x[8]*data["CRCP"]+ x[9]*data["tavg"]+x[10]*data["prcp"]+x[11]*data["TRUCK_PCT"]
-    c = x[12]+x[13]*data["AADT"]
-    return a+b*np.exp(-c*data["AGE"])
-
-
-# Performance model II    
-def m2(x,data):
-    a = x[0] + x[1]*data["SH"] + x[2]*data["US"]+x[3]*data["IH"]+x[4]*data["TRUCK_PCT"]
-    b = x[5] + x[6]*data["AC_Thick"]+x[7]*data["COM"]+x[8]*data["JCP"]+x[9]*data["CRCP"]+ x[10]*data["tavg"]+x[11]*data["prcp"]
-    c = x[12]+x[13]*data["AADT"]
-    t0 = x[14]
-    return a+b*np.exp(-c*(data["AGE"]-t0))   
-
-# a: const  SH US IH 
-# b: const AC_Thick COM JCP CRCP tavg prcp TRUCK_PCT    
-# c: const AADT
-
-#const SH US IH TRUCK_PCT
-#const AC_Thick COM  JCP CRCP tavg prcp
-#const AADT
-#const
-
-def m1_v1(x,data):
-    a = x[0] 
-    b = x[1] + x[2]*data["AC_Thick"]+x[3]*data["COM"]+x[4]*data["JCP"]+x[5]*data["CRCP"]+ x[6]*data["tavg"]+x[7]*data["prcp"]+x[8]*data["TRUCK_PCT"]
-    c = x[9]+x[10]*data["AADT"]
-    return a+b*np.exp(-c*data["AGE"])
-# a: const
-# b: const AC_Thick COM JCP CRCP tavg prcp TRUCK_PCT    
-# c: const AADT
-
-def m2_v1(x,data):
-    a = x[0] +x[1]*data["TRUCK_PCT"]
-    b = x[2] + x[3]*data["AC_Thick"]+x[4]*data["COM"]+x[5]*data["JCP"]+x[6]*data["CRCP"]+ x[7]*data["tavg"]+x[8]*data["prcp"]
-    c = x[9]+x[10]*data["AADT"]
-    t0 = x[11]
-    return a+b*np.exp(-c*(data["AGE"]-t0))   
-
-#const TRUCK_PCT
-#const AC_Thick COM  JCP CRCP tavg prcp
-#const AADT
-#const
-# Initial value
-x = {"stepwise":{"m1":np.array([7.049209e+00, -2.600203e+00, -8.963720e+00, -1.236767e+01,
-                                2.090193e+02, -5.817576e+00, -9.876824e+00, -1.143599e+01,
-                                -8.430132e+00, -2.608191e+00,  1.906576e-01,  3.395223e-01,
-                                1.083621e-01, -1.374227e-07]),
-                 "m2":np.array([1.184951e+01, -2.705696e+00, -9.117392e+00, -1.275260e+01, 3.073346e-01,
-                                2.116791e+02, -6.001680e+00, -1.025022e+01, -1.183063e+01, -8.687251e+00,-2.709774e+00,1.973484e-01,
-                                1.345769e-01,-1.931186e-07,
-                                5.967551e-01])},
-     "step_iter":{"m1":np.array([7.049209e+00, -2.600203e+00, -8.963720e+00, -1.236767e+01,
-                                2.090193e+02,-5.817576e+00, -9.876824e+00, -1.143599e+01, -8.430132e+00, -2.608191e+00, 1.906576e-01, 3.395223e-01,
-                                1.083621e-01, -1.374227e-07]), #1
-                  "m2":np.array([1.904065e+01, -2.780562e+00, -9.224207e+00, -1.299706e+01,
-                                3.126058e-01,  1.975575e+02, -5.801182e+00, -9.939388e+00,
-                                -1.147162e+01, -8.420724e+00, -2.633975e+00,  1.929804e-01,
-                                1.491272e-01, -3.103310e-08,  3.117803e-01])},           #34
-     "remove_facility":{"m1":np.array([2.74775611e+01,  1.87518114e+02, -5.99908654e+00, -1.24793455e+01,
-                                        -1.98010817e+01, -1.06650145e+01, -2.58736894e+00,  2.66982783e-01,
-                                        -8.24695544e-03, -3.02872924e-02,  9.07993449e-05]), #4
-                        "m2":np.array([1.54551180e+01,  8.35200000e-03,  2.16724455e+02, -9.17442400e+00,
-                                       -1.53231570e+01, -1.96587940e+01, -1.28957520e+01, -2.87093500e+00,
-                                        2.43233000e-01,  1.24019000e-01,  2.00000000e-06,  2.76063000e-01])}, 
-     'District-a': {'m1': np.array([-14.99377031,  -9.34209793,   0.38054699,   8.31692934,
-                                    -3.05884358,  -1.91602142,  -3.72421799,  -2.42262516,
-                                    -4.30360067,   0.98628697,   0.3731446 ,   2.0343066 ,
-                                    -0.19648616]),
-                    'm2': np.array([-15.17340897, -11.65252878,   3.51311267,   1.04489045,
-                                    -9.58837323,  -6.1818586 ,   1.12447323,  -0.75967163,
-                                    -1.2924821 ,  -1.65026649,   0.29063893,   3.45658544,
-                                    1.89014777])},
-    'District-b': {'m1': np.array([-1.55273302e+18,  8.55386115e+00, -1.64231067e+13,  8.18061439e+02,
-                                    4.32513456e+01, -1.70839702e+00, -2.15732927e+05, -3.00884772e+10,
-                                    -1.58046292e+04, -3.07578917e+03, -3.12837524e+08, -7.32758556e+00,
-                                    -1.20692454e+16]),
-                    'm2': np.array([-27.1920906 , -15.42510742,   6.90382704,   2.24347716,
-                                    -11.40708527,  -7.58160632,   0.98342646,  -1.87753783,
-                                    -1.71774125,  -2.43522073,   0.39888897,   4.19585498,
-                                    2.54567803])}
-     } #2
+# Stored coefficients from the registry, newest version of every (approach, model)
+x = coefficientSet()
+
+
+# Sweep design and SN curves, memoized per approach, model and design
+@st.cache_resource(max_entries = 16)
+def sensitivitySweep(method, model, levels, mode, age):
+    miss()
+    sw = design(levels, mode = "oat" if mode == "One at a time" else "factorial")
+    spec, coef = variant(x, method, model)
+    return sw, sweepCurves(spec, coef, sw, np.arange(age[0], age[1]+0.25, 0.5))
+
+
+# Global sensitivity indices, memoized per approach, model, method and ages
+@st.cache_resource(max_entries = 16)
+def globalSensitivity(method, model, gsaMethod, ages):
+    miss()
+    spec, coef = variant(x, method, model)
+    if gsaMethod == "Sobol":
+        return sobolIndices(spec, coef, ages)
+    return morrisEffects(spec, coef, ages)
+
+
+def parseLevels(text):
+    """Comma separated numeric levels, ValueError unless there is at least one and all are numbers"""
+    levels = [float(v) for v in text.split(",") if v.strip()]
+    if not levels:
+        raise ValueError("no levels")
+    return [int(v) if v.is_integer() else v for v in levels]
+
 
 try:
     if st.session_state["allow"]:
+        startRun("Sensitivity")
 
         st.write("This section investigates the effect of different variables on the model prediction.")
 
-        plotData = pd.DataFrame({"AGE": np.repeat(np.arange(0, 10, 0.5),21), 
-                                    "PAV_TYPE": (["AC_Thin", "AC_Thick", "COM", "JCP", "CRCP"]+["AC_Thick"]*16)*20, 
-                                    "HIGHWAY_FUN": (["FM"]*5+ ["FM", "SH", "US", "IH"]+ ["FM"]*12)*20, 
-                                    "AADT": ([5000]*9+[2000, 5000, 15000]+[5000]*9)*20, 
-                                    "TRUCK_PCT": ([15]*12+ [10, 15, 25]+[15]*6)*20, 
-                                    "tavg": ([67]*15+ [56, 67, 72]+[67]*3)*20, 
-                                    "prcp":([35]*18+[33,35,45])*20, 
-                                    "tag": (["PAV_TYPE"]*5 + ["HIGHWAY_FUN"]*4+["AADT"]*3+["TRUCK_PCT"]*3+["tavg"]*3+["prcp"]*3)*20}).sort_values(by = ["tag", "AGE"])
-
-        plotData_v1 = pd.get_dummies(plotData[["PAV_TYPE", "HIGHWAY_FUN"]]).rename(columns={'PAV_TYPE_AC_Thick': "AC_Thick", 
-                                                                                            'PAV_TYPE_AC_Thin':"AC_Thin",
-                                                                                            'PAV_TYPE_COM': "COM",
-                                                                                            'PAV_TYPE_CRCP':"CRCP",
-                                                                                            'PAV_TYPE_JCP':"JCP", 
-                                                                                            'HIGHWAY_FUN_FM':"FM", 
-                                                                                            'HIGHWAY_FUN_IH':"IH",
-                                                                                            'HIGHWAY_FUN_SH':"SH", 
-                                                                                            'HIGHWAY_FUN_US':"US"})
-        plotData = pd.concat([plotData, plotData_v1], axis= 1)
-
         with st.sidebar:
             methodOpt = st.selectbox("Select approach:", ["stepwise", "step_iter", "remove_facility"])
             modelOpt = st.selectbox("Select model:", ('m1', 'm2'))
-            # plot
-            if methodOpt !="remove_facility":
-                if modelOpt == "m1":
-                    plotData["SN"] = m1(x[methodOpt][modelOpt], plotData)
-                if modelOpt == "m2":       
-                    plotData["SN"] = m2(x[methodOpt][modelOpt], plotData)
-            else:
-                if modelOpt == "m1":
-                    plotData["SN"] = m1_v1(x[methodOpt][modelOpt], plotData)
-                if modelOpt == "m2":       
-                    plotData["SN"] = m2_v1(x[methodOpt][modelOpt], plotData)
+            designOpt = st.radio("Select design:", ("One at a time", "Full factorial"))
+            with st.expander("Levels"):
+                levelOpt = {"PAV_TYPE": st.multiselect("Pavement", LEVELS["PAV_TYPE"], LEVELS["PAV_TYPE"]),
+                            "HIGHWAY_FUN": st.multiselect("Facility", LEVELS["HIGHWAY_FUN"], LEVELS["HIGHWAY_FUN"])}
+                for var in ["AADT", "TRUCK_PCT", "tavg", "prcp"]:
+                    try:
+                        levelOpt[var] = parseLevels(st.text_input(var, ", ".join(str(v) for v in LEVELS[var])))
+                    except ValueError: # a typo falls back to the default levels instead of blanking the page
+                        st.sidebar.error(var+": enter comma separated numbers, using the default levels")
+                        levelOpt[var] = LEVELS[var]
+                ageOpt = st.slider("AGE", 0.0, 30.0, (0.0, 9.5), step = 0.5)
+            with st.expander("Global sensitivity"):
+                gsaShow = st.checkbox("Show global sensitivity indices")
+                gsaMethod = st.radio("Method:", ("Sobol", "Morris"))
+                gsaAges = tuple(sorted(st.multiselect("At AGE", list(range(0, 31)), [1, 5, 9])))
+
+        # curves of the selected model over the design, summarized per level of each variable
+        ages = np.arange(ageOpt[0], ageOpt[1]+0.25, 0.5)
+        key = lambda tag: figureKey("Sensitivity", methodOpt, modelOpt, x[methodOpt][modelOpt], levelOpt, designOpt, ageOpt, tag)
+
+        def figure(name, key, build):
+            with stage("figure "+name, cached = True):
+                return cachedFigure(key, build)
+
+        def tagPlot(tag):
+            """SN vs. AGE curves over the levels of one variable, built only on a figure cache miss"""
+            with stage("sensitivitySweep", cached = True) as s:
+                sw, SN = sensitivitySweep(methodOpt, modelOpt, levelOpt, designOpt, ageOpt)
+                s["rows"] = len(SN)
+            names = sw["levels"][tag]
+            if designOpt == "One at a time":
+                rows = np.flatnonzero(sw["varied"] == tag)
+                return curveFigure(ages, SN[rows], names, legend_title = tag)
+            lower, median, upper = np.moveaxis(levelSummary(sw, SN, tag), 1, 0)
+            return curveFigure(ages, median, names, lower = lower, upper = upper, legend_title = tag+" (median, 10-90%)")
+
         col1, col2, col3 = st.columns(3)
         with col1:
             with st.container():
                 st.write("Pavement Type")
-                fig = px.line(plotData.loc[plotData["tag"] == "PAV_TYPE"], 
-                                x = "AGE", 
-                                y = "SN", 
-                                color= "PAV_TYPE")
-                fig.update_layout(yaxis_range=[0,80])
-                st.plotly_chart(fig,use_container_width=True)
+                fig = figure("PAV_TYPE", key("PAV_TYPE"), lambda: tagPlot("PAV_TYPE"))
+                with stage("plotly_chart"):
+                    st.plotly_chart(fig,use_container_width=True)
 
             with st.container():
                 st.write("Facility Type")
-                fig = px.line(plotData.loc[plotData["tag"] == "HIGHWAY_FUN"], 
-                                x = "AGE", 
-                                y = "SN", 
-                                color= "HIGHWAY_FUN")
-                fig.update_layout(yaxis_range=[0,80])
-                st.plotly_chart(fig,use_container_width=True)
+                fig = figure("HIGHWAY_FUN", key("HIGHWAY_FUN"), lambda: tagPlot("HIGHWAY_FUN"))
+                with stage("plotly_chart"):
+                    st.plotly_chart(fig,use_container_width=True)
 
         with col2:
             with st.container():
                 st.write("AADT")
-                fig = px.line(plotData.loc[plotData["tag"] == "AADT"], 
-                                x = "AGE", 
-                                y = "SN", 
-                                color= "AADT")
-                fig.update_layout(yaxis_range=[0,80])        
-                st.plotly_chart(fig,use_container_width=True)
+                fig = figure("AADT", key("AADT"), lambda: tagPlot("AADT"))
+                with stage("plotly_chart"):
+                    st.plotly_chart(fig,use_container_width=True)
 
 
             with st.container():
                 st.write("Truck Percentage")
-                fig = px.line(plotData.loc[plotData["tag"] == "TRUCK_PCT"], 
-                                x = "AGE", 
-                                y = "SN", 
-                                color= "TRUCK_PCT")
-                fig.update_layout(yaxis_range=[0,80])        
-                st.plotly_chart(fig,use_container_width=True)
+                fig = figure("TRUCK_PCT", key("TRUCK_PCT"), lambda: tagPlot("TRUCK_PCT"))
+                with stage("plotly_chart"):
+                    st.plotly_chart(fig,use_container_width=True)
 
         with col3:
             with st.container():
                 st.write("tavg")
-                fig = px.line(plotData.loc[plotData["tag"] == "tavg"], 
-                                x = "AGE", 
-                                y = "SN", 
-                                color= "tavg")
-                fig.update_layout(yaxis_range=[0,80])
-                
-                st.plotly_chart(fig,use_container_width=True)
+                fig = figure("tavg", key("tavg"), lambda: tagPlot("tavg"))
+                with stage("plotly_chart"):
+                    st.plotly_chart(fig,use_container_width=True)
 
             with st.container():
                 st.write("Precipitation")
-                fig = px.line(plotData.loc[plotData["tag"] == "prcp"], 
-                                x = "AGE", 
-                                y = "SN", 
-                                color= "prcp")
-                fig.update_layout(yaxis_range=[0,80])
-                
-                st.plotly_chart(fig,use_container_width=True)        
+                fig = figure("prcp", key("prcp"), lambda: tagPlot("prcp"))
+                with stage("plotly_chart"):
+                    st.plotly_chart(fig,use_container_width=True)
+
+        # variance-based (Sobol) or screening (Morris) indices over the whole input space
+        if gsaShow and gsaAges:
+            gsaKey = lambda tag: figureKey("Sensitivity", "global", methodOpt, modelOpt, x[methodOpt][modelOpt], gsaMethod, gsaAges, tag)
+            names = ["AGE "+str(a) for a in gsaAges]
+            with stage("globalSensitivity", cached = True):
+                first, second = globalSensitivity(methodOpt, modelOpt, gsaMethod, gsaAges)
+            titles = ("First-order index", "Total-order index") if gsaMethod == "Sobol" else ("mu*", "sigma")
+            col1, col2 = st.columns(2)
+            with col1:
+                st.write(titles[0])
+                fig = figure(titles[0], gsaKey(titles[0]), lambda: indexFigure(VARIABLES, first.T, names, y_title = titles[0]))
+                with stage("plotly_chart"):
+                    st.plotly_chart(fig,use_container_width=True)
+            with col2:
+                st.write(titles[1])
+                fig = figure(titles[1], gsaKey(titles[1]), lambda: indexFigure(VARIABLES, second.T, names, y_title = titles[1]))
+                with stage("plotly_chart"):
+                    st.plotly_chart(fig,use_container_width=True)
+
+        run = finishRun()
+        with st.sidebar:
+            if st.checkbox("Performance panel"): # per-stage timings of this rerun
+                debugPanel(run)
     else:
         st.write("Login to view the app")
         st.session_state["allow"] = check_password()
@@ -8,6 +8,8 @@ import plotly.graph_objects as go
 from urllib.request import urlopen
 import json
 
+from friction.data import loadTable
+
 st.set_page_config(layout="wide", 
                    page_title='Friction Modeling', 
                    menu_items={
@@ -59,9 +61,8 @@ def dataLoad(_conn):
     mode2: select for multiple segment
     creating 2d array of the height measurement
     """
-    data = conn.query('SELECT * from est_per_proj;') 
-    data.replace("#NAME?", np.nan, inplace = True)
-    txCounty = conn.query('SELECT * from tx_county_district;') 
+    data = loadTable(conn, "est_per_proj", na_values = "#NAME?")
+    txCounty = loadTable(conn, "tx_county_district")
     return data, txCounty
 
 
@@ -0,0 +1,122 @@
+"""Snapshot refresh against a SQLite stand-in for the MySQL connection"""
+import concurrent.futures
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+import sqlalchemy
+
+from friction import data as snapshots
+
+
+class SQLiteConnection:
+    """The conn.query(sql, params, ttl) interface of st.connection over a SQLite engine"""
+
+    def __init__(self, path):
+        self.engine = sqlalchemy.create_engine("sqlite:///"+str(path))
+        self.queries = []
+
+    def query(self, sql, params = None, ttl = None):
+        self.queries.append(sql)
+        with self.engine.connect() as con:
+            return pd.read_sql(sqlalchemy.text(sql), con, params = params)
+
+    def write(self, table, rows, if_exists = "append"):
+        rows.to_sql(table, self.engine, index = False, if_exists = if_exists)
+
+
+@pytest.fixture
+def conn(tmp_path, monkeypatch):
+    monkeypatch.setattr(snapshots, "SNAPSHOT_DIR", str(tmp_path/"snapshots"))
+    conn = SQLiteConnection(tmp_path/"db.sqlite")
+    conn.write("fric", pd.DataFrame({"id": [1, 2, 3], "CONT": [10, 20, 30], "SN": [40.5, 35.0, 30.25]}))
+    return conn
+
+
+def test_mergeRows():
+    data = pd.DataFrame({"CONT": [10, 20, 30], "SN": [1.0, 2.0, 3.0]})
+    delta = pd.DataFrame({"CONT": [40, 20], "SN": [4.0, 5.0]})
+    merged = snapshots.mergeRows(data, delta, ["CONT"])
+    assert merged["CONT"].tolist() == [10, 20, 30, 40]
+    assert merged["SN"].tolist() == [1.0, 5.0, 3.0, 4.0]
+    assert snapshots.mergeRows(data, delta.iloc[:0], ["CONT"]) is data
+    assert len(snapshots.mergeRows(data, delta, None)) == 5
+
+
+def test_refreshTable_append(conn):
+    snapshots.loadTable(conn, "fric", watermark = "id")
+    conn.write("fric", pd.DataFrame({"id": [4, 5], "CONT": [40, 50], "SN": [28.0, 27.5]}))
+    data, pulled = snapshots.refreshTable(conn, "fric", "id", key = ["CONT"])
+    assert pulled == 2
+    assert data["CONT"].tolist() == [10, 20, 30, 40, 50]
+    assert snapshots.snapshotMeta("fric")["watermark"] == 5
+
+
+def test_refreshTable_replace_by_key(conn):
+    snapshots.loadTable(conn, "fric", watermark = "id")
+    before = snapshots.datasetHandle("fric")
+    conn.write("fric", pd.DataFrame({"id": [4], "CONT": [20], "SN": [33.0]}))
+    data, pulled = snapshots.refreshTable(conn, "fric", "id", key = ["CONT"])
+    assert pulled == 1
+    assert data["CONT"].tolist() == [10, 20, 30]
+    np.testing.assert_array_equal(data["SN"].to_numpy(), [40.5, 33.0, 30.25])
+    assert snapshots.datasetHandle("fric") != before
+
+
+def test_refreshTable_empty_delta(conn):
+    snapshots.loadTable(conn, "fric", watermark = "id")
+    before = snapshots.datasetHandle("fric")
+    data, pulled = snapshots.refreshTable(conn, "fric", "id", key = ["CONT"])
+    assert pulled == 0
+    assert len(data) == 3
+    assert snapshots.datasetHandle("fric") == before
+
+
+def test_refreshTables_unchanged_full_reload(conn):
+    snapshots.loadTable(conn, "fric")
+    before = snapshots.datasetHandle("fric")
+    assert snapshots.refreshTables(conn, ["fric"], {}) == {"fric": 0}
+    assert snapshots.datasetHandle("fric") == before
+    conn.write("fric", pd.DataFrame({"id": [4], "CONT": [40], "SN": [28.0]}))
+    assert snapshots.refreshTables(conn, ["fric"], {}) == {"fric": 4}
+    assert snapshots.datasetHandle("fric") != before
+
+
+def test_refreshTables_stores_missing_watermark(conn):
+    config = {"fric": {"watermark": "id", "key": ["CONT"]}}
+    before = snapshots.ensureSnapshot(conn, "fric")  # written without a watermark, as the pages do
+    assert snapshots.snapshotMeta("fric")["watermark"] is None
+    assert snapshots.refreshTables(conn, ["fric"], config) == {"fric": 0}
+    assert snapshots.snapshotMeta("fric")["watermark"] == 3
+    assert snapshots.datasetHandle("fric") == before
+    conn.queries.clear()
+    assert snapshots.refreshTables(conn, ["fric"], config) == {"fric": 0}
+    assert conn.queries == ["SELECT * from fric WHERE id > :mark;"]
+
+
+def test_ensureSnapshot_concurrent_cold_start(conn):
+    with concurrent.futures.ThreadPoolExecutor(max_workers = 8) as pool:
+        handles = list(pool.map(lambda _: snapshots.ensureSnapshot(conn, "fric"), range(16)))
+    assert len(set(handles)) == 1
+    assert conn.queries == ["SELECT * from fric;"]
+
+
+def test_writeSnapshot_concurrent(conn):
+    data = pd.DataFrame({"CONT": np.arange(100000), "SN": np.linspace(20, 50, 100000)})
+    with concurrent.futures.ThreadPoolExecutor(max_workers = 8) as pool:
+        list(pool.map(lambda v: snapshots.writeSnapshot("fric", data, {"version": v}), range(16)))
+    assert snapshots.readSnapshot("fric").equals(data)
+    assert os.listdir(snapshots.SNAPSHOT_DIR) == ["fric.arrow"]
+
+
+def test_unwritable_snapshot_dir(conn, tmp_path, monkeypatch):
+    (tmp_path/"file").write_text("")
+    monkeypatch.setattr(snapshots, "SNAPSHOT_DIR", str(tmp_path/"file"/"snapshots"))  # not a directory
+    handle = snapshots.snapshotHandle(conn, "fric")
+    assert handle.version is None
+    assert conn.queries == []  # no full load that could not be stored
+    assert snapshots.handleData(conn, handle)["CONT"].tolist() == [10, 20, 30]
+    selected = snapshots.loadSelection(conn, "fric", ["SN"], {"CONT": [20, 30]})
+    assert selected["SN"].tolist() == [35.0, 30.25]
+    assert "WHERE `CONT` IN (:CONT_0, :CONT_1)" in conn.queries[-1]
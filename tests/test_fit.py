@@ -0,0 +1,21 @@
+"""Analytic Jacobian of the friction models against finite differences"""
+import numpy as np
+import pytest
+
+from friction.coefficients import coefficientSet
+from friction.fit import fitData, jacobian
+from friction.models import curve, coefMatrix, variant
+from friction.synth import synthFric
+
+
+@pytest.mark.parametrize("approach, model", [("stepwise", "m1"), ("stepwise", "m2"), ("remove_facility", "m2"), ("District-a", "m1")])
+def test_jacobian(approach, model):
+    x = coefficientSet()
+    spec, coef = variant(x, approach, model)
+    X, age, y, features = fitData(synthFric(500, seed = 1, x = x).astype({"AGE": np.float64}), [spec])
+    sn = lambda v: curve(X @ coefMatrix(spec, v, features), age)
+    J = jacobian(spec, coef, X, age, features)
+    h = 1e-6*np.abs(coef)+1e-12  # relative steps: the AADT coefficient is tiny
+    central = np.stack([(sn(coef+h[k]*e)-sn(coef-h[k]*e))/(2*h[k]) for k, e in enumerate(np.eye(len(spec)))], axis = 1)
+    scale = np.abs(J).max(axis = 0)  # per coefficient, columns differ by orders of magnitude
+    np.testing.assert_allclose(J/scale, central/scale, atol = 1e-6)
@@ -0,0 +1,34 @@
+"""Filter index selections against isin masks"""
+import numpy as np
+import pandas as pd
+
+from friction.index import buildIndex, selectRows
+
+
+def test_selectRows_random():
+    rng = np.random.default_rng(0)
+    n = 5000
+    data = pd.DataFrame({"DISTR": rng.integers(1, 26, n),
+                         "CONT": rng.integers(1, 400, n),
+                         "HIGHWAY_FUN": pd.Series(rng.choice(["FM", "SH", "US", "IH"], n)).where(rng.random(n) > 0.05),
+                         "PAV_TYPE": pd.Categorical(rng.choice(["AC_Thin", "AC_Thick", "AC_Com", "JCP", "CRCP"], n))})
+    index = buildIndex(data, tuple(data.columns))
+    for _ in range(300):
+        filters = {}
+        for col in data.columns:
+            present = data[col].dropna().unique()
+            kind = rng.integers(5)
+            if kind == 0:
+                filters[col] = None
+            elif kind == 1:
+                filters[col] = list(present)
+            elif kind == 2:
+                filters[col] = []
+            else:
+                picked = list(rng.choice(present, rng.integers(1, len(present)+1), replace = False))
+                filters[col] = picked+(["absent"] if data[col].dtype == object else [-1]) if kind == 4 else picked
+        mask = np.ones(n, dtype = bool)
+        for col, values in filters.items():
+            if values is not None:
+                mask &= data[col].isin(values).to_numpy()
+        np.testing.assert_array_equal(selectRows(index, filters), np.flatnonzero(mask))
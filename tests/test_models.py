@@ -0,0 +1,94 @@
+"""Vectorized models against the per-column formulas they replaced"""
+import numpy as np
+import pytest
+
+from friction.coefficients import coefficientSet
+from friction.models import DISTRICTS, allVariants, m1, m1_v1, m2, m2_v1, mdistrict, predictBatch
+from friction.synth import synthFric
+
+
+def old_m1(x, data):
+    a = x[0] + x[1]*data["SH"] + x[2]*data["US"]+x[3]*data["IH"]
+    b = x[4] + x[5]*data["AC_Thick"]+x[6]*data["COM"]+x[7]*data["JCP"]+x[8]*data["CRCP"]+ x[9]*data["tavg"]+x[10]*data["prcp"]+x[11]*data["TRUCK_PCT"]
+    c = x[12]+x[13]*data["AADT"]
+    return a+b*np.exp(-c*data["AGE"])
+
+
+def old_m2(x, data):
+    a = x[0] + x[1]*data["SH"] + x[2]*data["US"]+x[3]*data["IH"]+x[4]*data["TRUCK_PCT"]
+    b = x[5] + x[6]*data["AC_Thick"]+x[7]*data["COM"]+x[8]*data["JCP"]+x[9]*data["CRCP"]+ x[10]*data["tavg"]+x[11]*data["prcp"]
+    c = x[12]+x[13]*data["AADT"]
+    t0 = x[14]
+    return a+b*np.exp(-c*(data["AGE"]-t0))
+
+
+def old_m1_v1(x, data):
+    a = x[0]
+    b = x[1] + x[2]*data["AC_Thick"]+x[3]*data["COM"]+x[4]*data["JCP"]+x[5]*data["CRCP"]+ x[6]*data["tavg"]+x[7]*data["prcp"]+x[8]*data["TRUCK_PCT"]
+    c = x[9]+x[10]*data["AADT"]
+    return a+b*np.exp(-c*data["AGE"])
+
+
+def old_m2_v1(x, data):
+    a = x[0] +x[1]*data["TRUCK_PCT"]
+    b = x[2] + x[3]*data["AC_Thick"]+x[4]*data["COM"]+x[5]*data["JCP"]+x[6]*data["CRCP"]+ x[7]*data["tavg"]+x[8]*data["prcp"]
+    c = x[9]+x[10]*data["AADT"]
+    t0 = x[11]
+    return a+b*np.exp(-c*(data["AGE"]-t0))
+
+
+def old_mdistrict(x1, x2, data, model = "m1", group_method = "a"):
+    dist = sum(x2[k]*data[dummy] for k, dummy in enumerate(DISTRICTS))
+    if model == "m1":
+        a = x1[0]
+        b = x1[1] + x1[2]*data["AC_Thick"]+x1[3]*data["COM"]+x1[4]*data["JCP"]+x1[5]*data["CRCP"]+ x1[6]*data["tavg"]+x1[7]*data["prcp"]+x1[8]*data["TRUCK_PCT"]
+        c = x1[9]+x1[10]*data["AADT"]
+        t0 = 0.0
+    else:
+        a = x1[0] +x1[1]*data["TRUCK_PCT"]
+        b = x1[2] + x1[3]*data["AC_Thick"]+x1[4]*data["COM"]+x1[5]*data["JCP"]+x1[6]*data["CRCP"]+ x1[7]*data["tavg"]+x1[8]*data["prcp"]
+        c = x1[9]+x1[10]*data["AADT"]
+        t0 = x1[11]
+    if group_method == "a":
+        a = a+dist
+    if group_method == "b":
+        b = b+dist
+    return a + b*np.exp(-c*(data["AGE"]-t0))
+
+
+def old(x, approach, model, data):
+    if approach.startswith("District-"):
+        return old_mdistrict(x["remove_facility"][model], x[approach][model], data, model, approach[-1])
+    if approach == "remove_facility":
+        return {"m1": old_m1_v1, "m2": old_m2_v1}[model](x[approach][model], data)
+    return {"m1": old_m1, "m2": old_m2}[model](x[approach][model], data)
+
+
+@pytest.fixture
+def data():
+    data = synthFric(2000, seed = 3, x = coefficientSet())
+    data = data.astype({col: np.float64 for col in data.columns if data[col].dtype.kind in "fi"})
+    data.loc[[5, 17], "DAL"] = np.nan  # a missing district dummy
+    return data
+
+
+def test_model_functions(data):
+    x = coefficientSet()
+    np.testing.assert_allclose(m1(x["stepwise"]["m1"], data), old_m1(x["stepwise"]["m1"], data), rtol = 1e-12)
+    np.testing.assert_allclose(m2(x["stepwise"]["m2"], data), old_m2(x["stepwise"]["m2"], data), rtol = 1e-12)
+    np.testing.assert_allclose(m1_v1(x["remove_facility"]["m1"], data), old_m1_v1(x["remove_facility"]["m1"], data), rtol = 1e-12)
+    np.testing.assert_allclose(m2_v1(x["remove_facility"]["m2"], data), old_m2_v1(x["remove_facility"]["m2"], data), rtol = 1e-12)
+    for model in ("m1", "m2"):
+        for group in ("a", "b"):
+            new = mdistrict(x["remove_facility"][model], x["District-"+group][model], data, model, group)
+            ref = old_mdistrict(x["remove_facility"][model], x["District-"+group][model], data, model, group)
+            np.testing.assert_allclose(new, ref, rtol = 1e-12)  # NaN where the dummy is missing, in both
+            assert np.isnan(new[[5, 17]]).all()
+
+
+def test_predictBatch(data):
+    x = coefficientSet()
+    SN, variants = predictBatch(x, data)
+    assert variants == allVariants(x)
+    for i, (approach, model) in enumerate(variants):
+        np.testing.assert_allclose(SN[:, i], old(x, approach, model, data), rtol = 1e-12, err_msg = approach+" "+model)
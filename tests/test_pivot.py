@@ -0,0 +1,34 @@
+"""Per-county threshold counts against the groupby and merges they replace"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from friction.pivot import thresholdCounts, thresholdIndex
+
+
+def groupbyCounts(data, column, counties, threshold):
+    data = data.assign(compare = data[column] >= threshold)
+    pivot = data.groupby(["County_FIPS_Code", "compare"]).size().reset_index(name = "count")
+    above = counties.merge(pivot.loc[pivot["compare"], ["County_FIPS_Code", "count"]], how = "left", on = "County_FIPS_Code").fillna(0)
+    below = counties.merge(pivot.loc[~pivot["compare"], ["County_FIPS_Code", "count"]], how = "left", on = "County_FIPS_Code").fillna(0)
+    return above["count"].to_numpy(), below["count"].to_numpy()
+
+
+@pytest.fixture
+def data():
+    rng = np.random.default_rng(0)
+    n = 20000
+    values = rng.normal(30, 8, n).round(1)  # rounded: many ties
+    values[rng.random(n) < 0.05] = np.nan
+    return pd.DataFrame({"County_FIPS_Code": rng.choice(np.arange(48001, 48507, 2), n), "a_m1": values})
+
+
+def test_thresholdCounts(data):
+    counties = pd.DataFrame({"County_FIPS_Code": np.arange(48001, 48511, 2)})  # the last counties have no rows
+    index = thresholdIndex(data, "a_m1", counties["County_FIPS_Code"])
+    values = data["a_m1"].dropna()
+    for threshold in [-np.inf, values.min()-1, values.min(), 25.3, 30.0, values.median(), values.max(), values.max()+1, np.inf]:
+        above, below = thresholdCounts(index, threshold)
+        ref_above, ref_below = groupbyCounts(data, "a_m1", counties, threshold)
+        np.testing.assert_array_equal(above, ref_above)
+        np.testing.assert_array_equal(below, ref_below)
@@ -0,0 +1,21 @@
+"""Time-to-threshold solver against the forward curve"""
+import numpy as np
+
+from friction.models import curve
+from friction.threshold import thresholdAge
+
+
+def test_thresholdAge():
+    P = np.array([[20, 30, 0.2, 0],    # decays to 20: crosses 30
+                  [50, -1, -0.1, 0],   # falls without bound: crosses 30
+                  [40, 30, 0.2, 0],    # levels off above 30: never
+                  [20, 30, -0.2, 0],   # increasing: never
+                  [20, 30, 0, 0],      # constant above 30: never
+                  [20, -5, 0.2, 0],    # starts below 30
+                  [20, 30, 0.2, np.nan]])
+    age = thresholdAge(P, 30.0)
+    np.testing.assert_allclose(curve(P[:2], age[:2]), 30.0)
+    np.testing.assert_allclose(age[1], 10*np.log(20))
+    assert np.isinf(age[2:5]).all()
+    assert age[5] == 0
+    assert np.isnan(age[6])